@@ -0,0 +1,151 @@
+"""Encode time and bytes on the wire for a large report.
+
+Builds a ``get_report`` response for ``--bills`` bills (full detail, with every
+bill's items) and compares:
+
+- encoders: FastAPI's default path (``jsonable_encoder`` + ``json.dumps``), the
+  ``Report`` response model (validate + ``dump_json``) and ``FastJSONResponse``
+  (orjson), as used by the report endpoints
+- compression: gzip and brotli levels, with the time to send the body over a
+  ``--link-kbps`` connection
+- the endpoint itself, requested with and without Accept-Encoding
+
+Run from the backend directory:
+
+    python -m benchmarks.encoding
+    python -m benchmarks.encoding --bills 10000 --link-kbps 2000
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+os.environ.setdefault("LOG_FILE", "")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("BILL_JOURNAL", "")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+from benchmarks.fake_postgrest import FakePostgrest, seed, seed_rows  # noqa: E402
+
+
+def best_ms(call: Callable[[], Any], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def report_content(bills: int) -> Dict[str, Any]:
+    import main
+
+    rows = seed_rows(bills=bills, days=30, start=datetime(2025, 1, 1))["billing"]
+    bill_fields, _ = main.report_projection("full", None)
+    report = main.build_report(rows, bill_fields, "full")
+    report["complete"] = True
+    report["dateRange"] = {"start": "2025-01-01", "end": "2025-01-30", "type": "monthly"}
+    return report
+
+
+def bench_encoders(report: Dict[str, Any], repeat: int) -> List[Dict[str, Any]]:
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+
+    import main
+    from fast_response import dumps
+
+    model = TypeAdapter(main.Report)
+    encoders = {
+        "jsonable_encoder + json.dumps": lambda: json.dumps(jsonable_encoder(report)).encode(),
+        "Report model validate + dump_json": lambda: model.dump_json(model.validate_python(report)),
+        "FastJSONResponse (orjson)": lambda: dumps(report),
+    }
+    results = []
+    for name, encode in encoders.items():
+        ms = best_ms(encode, repeat)
+        results.append({"encoder": name, "ms": round(ms, 1), "bytes": len(encode())})
+        print(f"{name:<40} {ms:9.1f} ms  {results[-1]['bytes']:>10,} bytes")
+    return results
+
+
+def bench_compression(body: bytes, link_kbps: float, repeat: int) -> List[Dict[str, Any]]:
+    from fast_response import brotli
+
+    codecs: Dict[str, Callable[[], bytes]] = {"identity": lambda: body}
+    for level in (1, 6, 9):
+        codecs[f"gzip level {level}"] = lambda level=level: gzip.compress(body, level)
+    if brotli is not None:
+        for quality in (4, 5, 11):
+            codecs[f"brotli quality {quality}"] = lambda quality=quality: brotli.compress(
+                body, mode=brotli.MODE_TEXT, quality=quality)
+    results = []
+    for name, compress in codecs.items():
+        ms = best_ms(compress, 1 if "11" in name else repeat)
+        size = len(compress())
+        transfer_ms = size * 8 / link_kbps
+        results.append({"codec": name, "compress_ms": round(ms, 1), "bytes": size,
+                        "transfer_ms": round(transfer_ms), "total_ms": round(ms + transfer_ms)})
+        print(f"{name:<40} {ms:9.1f} ms  {size:>10,} bytes  {transfer_ms:9.0f} ms at {link_kbps:g} kbps"
+              f"  = {ms + transfer_ms:9.0f} ms")
+    if brotli is None:
+        print("(brotli not installed; only gzip is served)")
+    return results
+
+
+async def bench_endpoint(bills: int, repeat: int) -> List[Dict[str, Any]]:
+    import main
+    from catalog_cache import CatalogCache
+    from repository import SupabaseRepository
+
+    fake = FakePostgrest()
+    seed(fake, bills=bills, days=30, start=datetime(2025, 1, 1))
+    main.repo = SupabaseRepository("http://fake-postgrest", "benchmark", transport=fake)
+    main.catalog_cache = CatalogCache()
+    url = "/api/get_report?start_date=2025-01-01&end_date=2025-01-30&detail=full"
+    results = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://benchmark",
+                                 timeout=None) as client:
+        for accept in ("identity", "gzip", "br"):
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                response = await client.get(url, headers={"Accept-Encoding": accept})
+                timings.append((time.perf_counter() - started) * 1000)
+                response.raise_for_status()
+            encoding = response.headers.get("content-encoding", "identity")
+            results.append({"accept_encoding": accept, "content_encoding": encoding, "ms": round(min(timings), 1),
+                            "wire_bytes": response.num_bytes_downloaded})
+            print(f"GET get_report Accept-Encoding: {accept:<9} {min(timings):9.1f} ms  "
+                  f"{response.num_bytes_downloaded:>10,} bytes ({encoding})")
+    return results
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Encode time and response size for a large report")
+    parser.add_argument("--bills", type=int, default=10000, help="Bills in the report")
+    parser.add_argument("--link-kbps", type=float, default=1000, help="Client connection speed for transfer time")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best is reported)")
+    parser.add_argument("--json", help="Also write results to this file")
+    args = parser.parse_args(argv)
+
+    report = report_content(args.bills)
+    print(f"get_report with {args.bills} bills, detail=full")
+    results = {"encoders": bench_encoders(report, args.repeat)}
+    from fast_response import dumps
+    results["compression"] = bench_compression(dumps(report), args.link_kbps, args.repeat)
+    results["endpoint"] = asyncio.run(bench_endpoint(args.bills, args.repeat))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,487 @@
+"""In-memory stand-in for the Supabase PostgREST API.
+
+``FakePostgrest`` is an httpx transport, so a ``SupabaseRepository`` built with
+``transport=FakePostgrest(...)`` talks to it without any network. It covers
+the subset of PostgREST the API uses: select/insert/upsert/update/delete,
+eq/neq/gt/gte/lt/lte/in/is/like/ilike/match filters (and ``not.``/``or``),
+order, limit/offset, ``count=exact`` and the RPCs in ``backend/sql``.
+Every request can be delayed by ``latency`` seconds (plus random ``jitter``)
+to model the WAN round trip to Supabase. ``asgi_app`` serves the same fake
+over HTTP for benchmarks that need a separate process.
+"""
+import asyncio
+import bisect
+import json
+import random
+import re
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+
+class FakeTable:
+    def __init__(self, name: str, unique: Iterable[str] = (), defaults: Optional[Dict[str, Any]] = None,
+                 sorted_by: Optional[str] = None):
+        self.name = name
+        self.rows: List[Dict[str, Any]] = []
+        self.unique = tuple(unique)
+        self.defaults = defaults or {}
+        # Optional column kept sorted so gte/lt on it use bisect instead of a scan
+        self.sorted_by = sorted_by
+        self._sort_keys: List[Any] = []
+        self._next_id = 1
+
+    def insert(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        row = {**self.defaults, **row}
+        if row.get("id") is None:
+            row["id"] = self._next_id
+        self._next_id = max(self._next_id, int(row["id"]) + 1)
+        if self.sorted_by:
+            key = row.get(self.sorted_by) or ""
+            position = bisect.bisect_right(self._sort_keys, key)
+            self._sort_keys.insert(position, key)
+            self.rows.insert(position, row)
+        else:
+            self.rows.append(row)
+        return row
+
+    def load(self, rows: Iterable[Dict[str, Any]]) -> None:
+        for row in rows:
+            self.rows.append({**self.defaults, **row})
+            self._next_id = max(self._next_id, int(self.rows[-1].get("id") or 0) + 1)
+        if self.sorted_by:
+            self.rows.sort(key=lambda r: r.get(self.sorted_by) or "")
+            self._sort_keys = [r.get(self.sorted_by) or "" for r in self.rows]
+
+    def remove(self, rows: List[Dict[str, Any]]) -> None:
+        doomed = {id(row) for row in rows}
+        self.rows = [row for row in self.rows if id(row) not in doomed]
+        if self.sorted_by:
+            self._sort_keys = [r.get(self.sorted_by) or "" for r in self.rows]
+
+    def candidates(self, filters: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        if not self.sorted_by:
+            return self.rows
+        lo, hi = 0, len(self.rows)
+        for column, expression in filters:
+            if column != self.sorted_by:
+                continue
+            if expression.startswith("gte."):
+                lo = max(lo, bisect.bisect_left(self._sort_keys, expression[4:]))
+            elif expression.startswith("lt."):
+                hi = min(hi, bisect.bisect_left(self._sort_keys, expression[3:]))
+        return self.rows[lo:hi]
+
+
+def _coerce(raw: str, sample: Any) -> Any:
+    if isinstance(sample, bool):
+        return raw == "true"
+    if isinstance(sample, int):
+        try:
+            return int(raw)
+        except ValueError:
+            return float(raw)
+    if isinstance(sample, float):
+        return float(raw)
+    return raw
+
+
+def _like(pattern: str, flags: int = 0) -> re.Pattern:
+    parts = [".*" if ch in "%*" else re.escape(ch) for ch in pattern]
+    return re.compile("^" + "".join(parts) + "$", flags | re.DOTALL)
+
+
+def _split_list(raw: str) -> List[str]:
+    raw = raw.strip("()")
+    values, current, quoted = [], "", False
+    for ch in raw:
+        if ch == '"':
+            quoted = not quoted
+        elif ch == "," and not quoted:
+            values.append(current)
+            current = ""
+        else:
+            current += ch
+    values.append(current)
+    return values
+
+
+def _matches(row: Dict[str, Any], column: str, expression: str) -> bool:
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    operator, _, raw = expression.partition(".")
+    value = row.get(column)
+
+    if operator == "is":
+        result = (value is None) if raw == "null" else (value is (raw == "true"))
+        return result != negate
+    if value is None:
+        # SQL comparisons with NULL are never true, negated or not
+        return False
+
+    if operator == "in":
+        result = value in [_coerce(v, value) for v in _split_list(raw)]
+    elif operator in ("like", "ilike"):
+        result = bool(_like(raw, re.IGNORECASE if operator == "ilike" else 0).match(str(value)))
+    elif operator in ("match", "imatch"):
+        result = re.search(raw, str(value), re.IGNORECASE if operator == "imatch" else 0) is not None
+    else:
+        other = _coerce(raw, value)
+        result = {
+            "eq": value == other,
+            "neq": value != other,
+            "gt": value > other,
+            "gte": value >= other,
+            "lt": value < other,
+            "lte": value <= other,
+        }[operator]
+    return result != negate
+
+
+def _matches_or(row: Dict[str, Any], expression: str) -> bool:
+    for condition in _split_list(expression):
+        column, _, rest = condition.partition(".")
+        if _matches(row, column, rest):
+            return True
+    return False
+
+
+def _sort(rows: List[Dict[str, Any]], order: str) -> List[Dict[str, Any]]:
+    for part in reversed(order.split(",")):
+        column, *modifiers = part.split(".")
+        descending = "desc" in modifiers
+        present = [r for r in rows if r.get(column) is not None]
+        missing = [r for r in rows if r.get(column) is None]
+        present.sort(key=lambda r: r[column], reverse=descending)
+        # PostgreSQL puts NULLs last ascending and first descending
+        nulls_first = "nullsfirst" in modifiers or (descending and "nullslast" not in modifiers)
+        rows = missing + present if nulls_first else present + missing
+    return rows
+
+
+def _project(row: Dict[str, Any], select: str) -> Dict[str, Any]:
+    if select in ("*", ""):
+        return dict(row)
+    return {column: row.get(column) for column in select.split(",")}
+
+
+class FakePostgrest(httpx.AsyncBaseTransport):
+    """Async httpx transport that serves PostgREST requests from in-memory tables."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, max_rows: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        # PostgREST's db-max-rows: no select returns more, whatever its limit
+        self.max_rows = max_rows
+        self.requests = 0
+        self.tables: Dict[str, FakeTable] = {}
+        self.rpcs: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+            "decrement_product_stock": self._decrement_product_stock,
+            "record_daily_sale": self._record_daily_sale,
+            "rebuild_daily_sales": self._rebuild_daily_sales,
+            "upsert_customers": self._upsert_customers,
+            "merge_customers": self._merge_customers,
+        }
+        self.add_table("products", unique=("code",))
+        self.add_table("services", unique=("code",))
+        self.add_table("customer")
+        self.add_table("billing", sorted_by="payment_date")
+        self.add_table("daily_sales", unique=("day", "payment_method"))
+
+    def add_table(self, name: str, **options) -> FakeTable:
+        self.tables[name] = FakeTable(name, **options)
+        return self.tables[name]
+
+    def table(self, name: str) -> FakeTable:
+        return self.tables[name]
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + random.random() * self.jitter)
+        await request.aread()
+        path = request.url.path.split("/rest/v1/", 1)[-1]
+        try:
+            if path.startswith("rpc/"):
+                return self._rpc(path[4:], request)
+            return self._table_request(path, request)
+        except KeyError as e:
+            return self._error(404, "42P01", f"relation {e} does not exist")
+
+    # --- helpers ---
+    @staticmethod
+    def _error(status: int, code: str, message: str) -> httpx.Response:
+        return httpx.Response(status, json={"code": code, "message": message, "details": None, "hint": None})
+
+    @staticmethod
+    def _json(status: int, data: Any, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        return httpx.Response(status, content=json.dumps(data, default=str).encode(),
+                              headers={"content-type": "application/json", **(headers or {})})
+
+    def _filtered(self, table: FakeTable, params: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        reserved = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+        filters = [(k, v) for k, v in params if k not in reserved and k != "or"]
+        or_filters = [v for k, v in params if k == "or"]
+        rows = table.candidates(filters)
+        if not filters and not or_filters:
+            return list(rows)
+        return [
+            row for row in rows
+            if all(_matches(row, k, v) for k, v in filters)
+            and all(_matches_or(row, v[1:-1]) for v in or_filters)
+        ]
+
+    def _violates_unique(self, table: FakeTable, row: Dict[str, Any], ignore: Optional[Dict[str, Any]] = None) -> bool:
+        if not table.unique:
+            return False
+        key = tuple(row.get(column) for column in table.unique)
+        return any(
+            existing is not ignore and tuple(existing.get(column) for column in table.unique) == key
+            for existing in table.rows
+        )
+
+    # --- tables ---
+    def _table_request(self, name: str, request: httpx.Request) -> httpx.Response:
+        table = self.tables[name]
+        params = list(request.url.params.multi_items())
+        query = dict(params)
+        prefer = request.headers.get("prefer", "")
+        method = request.method
+
+        if method in ("GET", "HEAD"):
+            rows = self._filtered(table, params)
+            total = len(rows)
+            if "order" in query:
+                rows = _sort(list(rows), query["order"])
+            offset = int(query.get("offset", 0))
+            limit = query.get("limit")
+            rows = rows[offset:offset + int(limit)] if limit is not None else rows[offset:]
+            if self.max_rows is not None:
+                rows = rows[:self.max_rows]
+            select = query.get("select", "*")
+            headers = {}
+            if "count=exact" in prefer:
+                end = offset + len(rows) - 1
+                headers["content-range"] = f"{offset}-{end}/{total}" if rows else f"*/{total}"
+            if method == "HEAD":
+                return httpx.Response(200, headers=headers)
+            return self._json(200, [_project(row, select) for row in rows], headers)
+
+        body = json.loads(request.content or b"null")
+        if method == "POST":
+            records = body if isinstance(body, list) else [body]
+            written = []
+            if "resolution=" in prefer:
+                conflict = query.get("on_conflict", "id").split(",")
+                existing_rows = {tuple(r.get(column) for column in conflict): r for r in table.rows}
+                for record in records:
+                    key = tuple(record.get(column) for column in conflict)
+                    # NULLs never conflict, as in Postgres
+                    existing = existing_rows.get(key) if None not in key else None
+                    if existing is not None:
+                        if "resolution=ignore-duplicates" in prefer:
+                            continue
+                        existing.update(record)
+                        written.append(existing)
+                    elif None in key:
+                        written.append(table.insert(dict(record)))
+                    else:
+                        written.append(existing_rows.setdefault(key, table.insert(record)))
+            else:
+                for record in records:
+                    if self._violates_unique(table, record):
+                        return self._error(409, "23505", f'duplicate key value violates unique constraint "{name}_code_key"')
+                for record in records:
+                    written.append(table.insert(dict(record)))
+            if name == "billing":
+                self._add_to_customers(written)
+            return self._json(201, [dict(r) for r in written] if "return=representation" in prefer else [])
+
+        if method == "PATCH":
+            rows = self._filtered(table, params)
+            for row in rows:
+                row.update(body)
+            return self._json(200, [dict(r) for r in rows] if "return=representation" in prefer else [])
+
+        if method == "DELETE":
+            rows = self._filtered(table, params)
+            table.remove(rows)
+            return self._json(200, [dict(r) for r in rows] if "return=representation" in prefer else [])
+
+        return self._error(405, "PGRST000", f"Unsupported method {method}")
+
+    # --- RPCs (see backend/sql) ---
+    def _rpc(self, name: str, request: httpx.Request) -> httpx.Response:
+        if name not in self.rpcs:
+            return self._error(404, "PGRST202", f"Could not find the function public.{name}")
+        params = json.loads(request.content or b"{}")
+        result = self.rpcs[name](params)
+        if result is None:
+            return httpx.Response(204)
+        return self._json(200, result)
+
+    def _decrement_product_stock(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        amounts: Dict[Any, int] = {}
+        for item in params["items"]:
+            amounts[item["id"]] = amounts.get(item["id"], 0) + int(item["quantity"])
+        results = []
+        for row in self.tables["products"].rows:
+            if row["id"] in amounts:
+                previous = row.get("quantity") or 0
+                row["quantity"] = max(0, previous - amounts[row["id"]])
+                results.append({"id": row["id"], "previous_quantity": previous, "quantity": row["quantity"]})
+        return results
+
+    def _record_daily_sale(self, params: Dict[str, Any]) -> None:
+        table = self.tables["daily_sales"]
+        key = (params["sale_day"], params.get("sale_payment_method") or "")
+        row = next((r for r in table.rows if (r["day"], r["payment_method"]) == key), None)
+        if row is None:
+            row = table.insert({"day": key[0], "payment_method": key[1], "bill_count": 0,
+                                "total": 0, "product_sales": 0, "service_sales": 0})
+        row["bill_count"] += params.get("sale_bill_count", 1)
+        row["total"] += params["sale_total"]
+        row["product_sales"] += params["sale_product_sales"]
+        row["service_sales"] += params["sale_service_sales"]
+        return None
+
+    def _rebuild_daily_sales(self, params: Dict[str, Any]) -> int:
+        start, end = params["start_day"], params["end_day"]
+        table = self.tables["daily_sales"]
+        table.remove([r for r in table.rows if start <= r["day"] < end])
+        rollup: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for bill in self.tables["billing"].candidates([("payment_date", f"gte.{start}"), ("payment_date", f"lt.{end}")]):
+            day = str(bill["payment_date"])[:10]
+            row = rollup.setdefault((day, bill.get("payment_method") or ""), {
+                "day": day, "payment_method": bill.get("payment_method") or "", "bill_count": 0,
+                "total": 0, "product_sales": 0, "service_sales": 0})
+            row["bill_count"] += 1
+            row["total"] += bill.get("total") or 0
+            for item in bill.get("items") or []:
+                if item.get("type") == "product":
+                    row["product_sales"] += item.get("total", 0)
+                elif item.get("type") == "service":
+                    row["service_sales"] += item.get("total", 0)
+        for row in rollup.values():
+            table.insert(row)
+        return len(rollup)
+
+
+    def _add_to_customers(self, bills: List[Dict[str, Any]]) -> None:
+        # The billing_add_to_customer trigger (sql/customers.sql)
+        customers = {row["id"]: row for row in self.tables["customer"].rows}
+        for bill in bills:
+            row = customers.get(bill.get("customer_id"))
+            if row is None:
+                continue
+            row["payment"] = (row.get("payment") or 0) + (bill.get("total") or 0)
+            if bill.get("payment_date") and (not row.get("payment_date") or bill["payment_date"] > row["payment_date"]):
+                row["payment_date"] = bill["payment_date"]
+
+    def _customers_by_key(self) -> Dict[str, Dict[str, Any]]:
+        return {row["customer_key"]: row for row in self.tables["customer"].rows if row.get("customer_key")}
+
+    def _upsert_customers(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        by_key = self._customers_by_key()
+        written = []
+        for record in params["rows"]:
+            existing = by_key.get(record.get("customer_key")) if record.get("customer_key") else None
+            if existing is None:
+                written.append(self.tables["customer"].insert(dict(record)))
+                continue
+            for column in ("name", "company"):
+                if str(record.get(column) or "").strip():
+                    existing[column] = record[column].strip()
+            written.append(existing)
+        return [dict(row) for row in written]
+
+    def _merge_customers(self, params: Dict[str, Any]) -> int:
+        table = self.tables["customer"]
+        by_id = {row["id"]: row for row in table.rows}
+        by_key = self._customers_by_key()
+        moved: Dict[Any, Any] = {}
+        for merge in params["merges"]:
+            keep = by_key.get(merge["customer_key"], by_id.get(merge["id"]))
+            for customer_id in merge["duplicates"] + [merge["id"]]:
+                if customer_id != keep["id"] and customer_id in by_id:
+                    moved[customer_id] = keep["id"]
+            keep.update({column: merge.get(column)
+                         for column in ("customer_key", "name", "company", "payment", "payment_date")})
+            by_key[merge["customer_key"]] = keep
+        for bill in self.tables["billing"].rows:
+            if bill.get("customer_id") in moved:
+                bill["customer_id"] = moved[bill["customer_id"]]
+        table.remove([by_id[customer_id] for customer_id in moved])
+        return len(moved)
+
+
+def asgi_app(fake: FakePostgrest):
+    """ASGI app serving ``fake`` over real HTTP (e.g. with uvicorn), for
+    benchmarks that run the API in another process."""
+
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        url = httpx.URL(path=scope["path"], query=scope["query_string"])
+        request = httpx.Request(scope["method"], url, headers=scope["headers"], content=body)
+        response = await fake.handle_async_request(request)
+        await send({"type": "http.response.start", "status": response.status_code,
+                    "headers": response.headers.raw})
+        await send({"type": "http.response.body", "body": response.content})
+
+    return app
+
+
+def seed_rows(products: int = 500, services: int = 50, bills: int = 0, days: int = 90,
+              start: Optional[datetime] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """A catalog and ``bills`` bills spread over ``days`` days, as rows per table."""
+    rng = random.Random(42)
+    tables: Dict[str, List[Dict[str, Any]]] = {
+        "products": [
+            {"id": i, "name": f"Product {i}", "code": f"P{i:05d}", "price": round(rng.uniform(1, 200), 2),
+             "quantity": 1_000_000, "discount": 0, "user_type": "admin", "edited_by": "no"}
+            for i in range(1, products + 1)
+        ],
+        "services": [
+            {"id": i, "name": f"Service {i}", "code": f"S{i:04d}", "price": round(rng.uniform(10, 500), 2),
+             "description": "", "user_type": "admin"}
+            for i in range(1, services + 1)
+        ],
+        "customer": [],
+        "billing": [],
+    }
+    if not bills:
+        return tables
+    start = start or datetime(2025, 1, 1)
+    for i in range(1, bills + 1):
+        when = start.timestamp() + (i * days * 86400) / bills
+        payment_date = datetime.utcfromtimestamp(when).isoformat()
+        items = [
+            {"id": rng.randint(1, products), "type": "product", "code": "P", "price": 10, "quantity": 1, "total": 10},
+            {"id": rng.randint(1, services), "type": "service", "code": "S", "price": 50, "quantity": 1, "total": 50},
+            {"id": rng.randint(1, products), "type": "product", "code": "P", "price": 5, "quantity": 2, "total": 10},
+        ]
+        tables["customer"].append({"id": i, "name": f"Customer {i % 997}", "mobile_no": f"07{i % 99999999:08d}",
+                                   "vehicel_no": f"CAB-{i % 9999:04d}", "company": "", "payment": 70,
+                                   "payment_date": payment_date})
+        tables["billing"].append({"id": i, "customer_id": i, "items": items,
+                                  "payment_method": rng.choice(["cash", "card"]),
+                                  "sub_total": 70, "total": 70, "vehicle_no": f"CAB-{i % 9999:04d}",
+                                  "payment_date": payment_date})
+    return tables
+
+
+def seed(fake: FakePostgrest, products: int = 500, services: int = 50, bills: int = 0,
+         days: int = 90, start: Optional[datetime] = None) -> None:
+    """Fill the fake with a catalog and ``bills`` bills spread over ``days`` days."""
+    for name, rows in seed_rows(products, services, bills, days, start).items():
+        if rows:
+            fake.table(name).load(rows)
@@ -0,0 +1,270 @@
+"""Throughput/latency benchmarks for the API against an in-memory backend.
+
+Run from the backend directory:
+
+    python -m benchmarks.run                      # every scenario
+    python -m benchmarks.run --scenario submit_bill --latency-ms 40
+    python -m benchmarks.run --scenario report --bills 1000 10000 100000
+    python -m benchmarks.run --storage sql        # in-memory SQLite via SqlRepository
+
+Each scenario prints p50/p95/p99 latency (ms), requests per second and the
+number of backend round trips per request.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Keep benchmark output clean and off main.log before the app configures logging
+os.environ.setdefault("LOG_FILE", "")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# submit_bill talks to the backend directly unless --journal is given
+os.environ.setdefault("BILL_JOURNAL", "")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+from benchmarks.fake_postgrest import FakePostgrest, seed, seed_rows  # noqa: E402
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class CallCounter:
+    """Repository observer that counts backend calls and still feeds /metrics."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, table: str, operation: str, seconds: float) -> None:
+        from metrics import observe_backend_call
+        self.calls += 1
+        observe_backend_call(table, operation, seconds)
+
+
+async def measure(name: str, counter: CallCounter, call: Callable[[int], Awaitable[httpx.Response]],
+                  requests: int, concurrency: int) -> Dict[str, Any]:
+    """Issue ``requests`` calls with ``concurrency`` in flight and summarize latencies."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    failures = 0
+
+    async def one(i: int):
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            response = await call(i)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                failures += 1
+
+    backend_before = counter.calls
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "scenario": name,
+        "requests": requests,
+        "concurrency": concurrency,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "rps": round(requests / elapsed, 1),
+        "backend_calls_per_request": round((counter.calls - backend_before) / requests, 1),
+        "failures": failures,
+    }
+    print(f"{name:<40} p50 {result['p50_ms']:>9.2f}  p95 {result['p95_ms']:>9.2f}  p99 {result['p99_ms']:>9.2f}"
+          f"  {result['rps']:>8.1f} req/s  {result['backend_calls_per_request']:>6.1f} calls/req"
+          + (f"  {failures} failed" if failures else ""))
+    return result
+
+
+def use_backend(args, products: int = 500, bills: int = 0, days: int = 90,
+                start: Optional[datetime] = None):
+    """Point the app at a freshly seeded backend (``--storage``) and return (app, counter)."""
+    import main
+    from catalog_cache import CatalogCache
+
+    counter = CallCounter()
+    if args.storage == "sql":
+        from sql_repository import SqlRepository
+
+        repo = SqlRepository("sqlite://", observer=counter)
+        for table, rows in seed_rows(products=products, bills=bills, days=days, start=start).items():
+            repo.load(table, rows)
+    else:
+        from repository import SupabaseRepository
+
+        fake = FakePostgrest(args.latency_ms / 1000, args.jitter_ms / 1000)
+        seed(fake, products=products, bills=bills, days=days, start=start)
+        repo = SupabaseRepository("http://fake-postgrest", "benchmark", transport=fake, observer=counter)
+    main.repo = repo
+    main.catalog_cache = CatalogCache()
+    return main.app, counter
+
+
+def client_for(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=None)
+
+
+def bill_payload(items: int) -> Dict[str, Any]:
+    """A bill of ``items`` lines over the seeded catalog, priced as the POS prices it
+    (Billing.tsx), so server-side pricing finds nothing to correct."""
+    catalog = seed_rows(products=400, services=0)["products"]
+    lines = []
+    for i in range(items):
+        product = catalog[i % 400]
+        price, quantity, discount = product["price"], 1, product["discount"]
+        lines.append({"id": product["id"], "type": "product", "name": product["name"], "code": product["code"],
+                      "price": price, "quantity": quantity, "discount": discount,
+                      "total": quantity * (price * (1 - discount / 100))})
+    sub_total = sum(line["price"] * line["quantity"] for line in lines)
+    total = sum(line["total"] for line in lines) * (1 - 0 / 100)
+    return {
+        "date": datetime.utcnow().isoformat(),
+        "customer": {"name": "Bench", "mobile": "0771234567", "vehicleNumber": "CAB-1234", "company": ""},
+        "discount": 0,
+        "items": lines,
+        "paymentMethod": "cash",
+        "subTotal": sub_total,
+        "total": total,
+    }
+
+
+async def bench_submit_bill(args) -> List[Dict[str, Any]]:
+    import main
+    from bill_journal import BillJournal, JournalSyncWorker
+
+    results = []
+    for items in args.items:
+        app, counter = use_backend(args)
+        payload = bill_payload(items)
+        with tempfile.TemporaryDirectory() as journal_dir:
+            if args.journal:
+                main.bill_journal = BillJournal(os.path.join(journal_dir, "bill_journal.db"))
+                main.journal_worker = JournalSyncWorker(main.bill_journal, main.sync_journaled_bills)
+                main.journal_worker.start()
+            async with client_for(app) as client:
+                result = await measure(
+                    f"submit_bill items={items}" + (" journaled" if args.journal else ""), counter,
+                    lambda i: client.post("/api/submit_bill", json=payload),
+                    args.requests, args.concurrency,
+                )
+            if args.journal:
+                # How long the background worker needs to push the backlog to the backend
+                started = time.perf_counter()
+                await main.journal_worker.drain()
+                result["journal_drain_s"] = round(time.perf_counter() - started, 2)
+                print(f"{'':<40} journal drained in {result['journal_drain_s']:.2f} s")
+                await main.journal_worker.stop()
+                main.bill_journal.close()
+                main.bill_journal = main.journal_worker = None
+        results.append(result)
+    return results
+
+
+async def bench_submit_bills(args) -> List[Dict[str, Any]]:
+    results = []
+    for bills in args.batch:
+        app, counter = use_backend(args)
+        payload = [bill_payload(5) for _ in range(bills)]
+        async with client_for(app) as client:
+            results.append(await measure(
+                f"submit_bills bills={bills} items=5", counter,
+                lambda i: client.post("/api/submit_bills", json=payload),
+                max(3, args.requests // bills), min(args.concurrency, 4),
+            ))
+    return results
+
+
+async def bench_report(args) -> List[Dict[str, Any]]:
+    results = []
+    for bills in args.bills:
+        app, counter = use_backend(args, bills=bills, days=90, start=datetime(2025, 1, 1))
+        requests = max(3, min(args.requests, 2_000_000 // bills))
+        async with client_for(app) as client:
+            for detail in ("summary", "full"):
+                url = f"/api/get_report?start_date=2025-01-01&end_date=2025-03-31&detail={detail}"
+                results.append(await measure(
+                    f"get_report bills={bills} detail={detail}", counter,
+                    lambda i: client.get(url), requests, min(args.concurrency, 4),
+                ))
+    return results
+
+
+async def bench_catalog(args) -> List[Dict[str, Any]]:
+    results = []
+    app, counter = use_backend(args, products=args.products)
+    async with client_for(app) as client:
+        for path in ("/api/get_products", "/api/get_services", "/api/get_all_data"):
+            results.append(await measure(
+                f"GET {path}", counter, lambda i: client.get(path), args.requests, args.concurrency,
+            ))
+        etag = (await client.get("/api/get_all_data")).headers.get("etag", "")
+        results.append(await measure(
+            "GET /api/get_all_data If-None-Match", counter,
+            lambda i: client.get("/api/get_all_data", headers={"If-None-Match": etag}),
+            args.requests, args.concurrency,
+        ))
+        results.append(await measure(
+            "GET /api/get_summary_data", counter,
+            lambda i: client.get("/api/get_summary_data"), args.requests, args.concurrency,
+        ))
+    return results
+
+
+SCENARIOS = {
+    "submit_bill": bench_submit_bill,
+    "submit_bills": bench_submit_bills,
+    "report": bench_report,
+    "catalog": bench_catalog,
+}
+
+
+async def run(args) -> List[Dict[str, Any]]:
+    backend = ("in-memory SQLite" if args.storage == "sql"
+               else f"PostgREST latency {args.latency_ms} ms (+{args.jitter_ms} ms jitter)")
+    print(f"{backend}, {args.requests} requests, concurrency {args.concurrency}")
+    results = []
+    for name in (SCENARIOS if args.scenario == "all" else [args.scenario]):
+        results.extend(await SCENARIOS[name](args))
+    return results
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=["all", *SCENARIOS], default="all")
+    parser.add_argument("--storage", choices=["fake", "sql"], default="fake",
+                        help="PostgREST fake (SupabaseRepository) or in-memory SQLite (SqlRepository)")
+    parser.add_argument("--journal", action="store_true",
+                        help="Acknowledge submit_bill from the local bill journal and sync in the background")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Injected PostgREST round-trip latency")
+    parser.add_argument("--jitter-ms", type=float, default=5, help="Random extra latency per request")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per measurement")
+    parser.add_argument("--concurrency", type=int, default=20, help="Requests in flight")
+    parser.add_argument("--items", type=int, nargs="+", default=[1, 5, 15, 50], help="Lines per bill")
+    parser.add_argument("--batch", type=int, nargs="+", default=[10, 200], help="Bills per submit_bills request")
+    parser.add_argument("--bills", type=int, nargs="+", default=[1000, 10000, 100000], help="Bills in the report range")
+    parser.add_argument("--products", type=int, default=2000, help="Catalog size for the catalog scenario")
+    parser.add_argument("--json", help="Also write results to this file")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
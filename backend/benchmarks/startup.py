@@ -0,0 +1,119 @@
+"""Cold-start benchmark: import time and first-request latency in a fresh process.
+
+On Vercel every cold start imports main.py and serves its first request before
+anything is warm, so both are measured in a new interpreter per run, the way
+Vercel sets the app up (``VERCEL=1``, Supabase backend). PostgREST is the
+in-memory fake, served over real HTTP so the first request also pays for
+building the HTTP client. Run from the backend directory:
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 9 --import-budget-ms 800 --first-request-budget-ms 1200
+
+Exits with status 1 when the median of either exceeds its budget, so it can
+gate a deploy.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Runs in each child: time ``import main``, then the lifespan plus the first
+# /api/get_all_data, and print both as JSON
+CHILD = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+first_started = time.perf_counter()
+with TestClient(main.app) as client:
+    response = client.get("/api/get_all_data")
+    first_done = time.perf_counter()
+    response.raise_for_status()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_request_ms": (first_done - first_started) * 1000,
+}))
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve_fake(port: int, latency: float) -> None:
+    """Serve a seeded FakePostgrest on ``port`` from a daemon thread."""
+    import uvicorn
+
+    from benchmarks.fake_postgrest import FakePostgrest, asgi_app, seed
+
+    fake = FakePostgrest(latency)
+    seed(fake)
+    server = uvicorn.Server(uvicorn.Config(asgi_app(fake), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("Fake PostgREST did not start")
+        time.sleep(0.01)
+
+
+def cold_start(port: int) -> Dict[str, float]:
+    env = {
+        **os.environ,
+        "VERCEL": "1",
+        "STORAGE_BACKEND": "supabase",
+        "SUPABASE_URL": f"http://127.0.0.1:{port}",
+        "SUPABASE_KEY": "benchmark",
+        "LOG_FILE": "",
+        "LOG_LEVEL": "WARNING",
+        "BILL_JOURNAL": "",
+    }
+    result = subprocess.run([sys.executable, "-c", CHILD], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for the API")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes to start")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Injected PostgREST round-trip latency")
+    parser.add_argument("--import-budget-ms", type=float, default=1000.0)
+    parser.add_argument("--first-request-budget-ms", type=float, default=1500.0)
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args(argv)
+
+    port = free_port()
+    serve_fake(port, args.latency_ms / 1000)
+    runs: List[Dict[str, float]] = []
+    for i in range(args.runs):
+        runs.append(cold_start(port))
+        print(f"run {i + 1}: import {runs[-1]['import_ms']:7.1f} ms  first request {runs[-1]['first_request_ms']:7.1f} ms")
+
+    summary: Dict[str, Any] = {"runs": runs}
+    failed = False
+    for metric, budget in (("import_ms", args.import_budget_ms), ("first_request_ms", args.first_request_budget_ms)):
+        median = statistics.median(run[metric] for run in runs)
+        ok = median <= budget
+        failed = failed or not ok
+        summary[metric] = {"median": round(median, 1), "budget": budget, "ok": ok}
+        print(f"{metric:<18} median {median:7.1f} ms  budget {budget:7.1f} ms  {'ok' if ok else 'OVER BUDGET'}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,359 @@
+"""Write-ahead journal for submitted bills.
+
+With the journal enabled ``submit_bill`` only appends the bill to a local
+SQLite file (WAL, ``synchronous=FULL`` so every commit is fsynced) and
+answers the cashier right away. ``JournalSyncWorker`` drains the journal to
+the backend in ``seq`` order, a batch of bills per pass (one multi-row insert
+per table). A bill is only attempted once every earlier bill has synced;
+after a failed batch the worker retries with exponential backoff one bill at
+a time, so a single bad bill is isolated and eventually parked. The steps
+already done for a bill (customer insert, billing insert, ...) are kept in
+its ``progress`` so a retry resumes instead of writing duplicates, and each
+bill carries a ``client_key`` ("<journal id>-<seq>") that the billing insert
+is idempotent on, for the case where an insert reached the database but its
+response was lost.
+
+Several processes may share one journal file (e.g. uvicorn workers). A worker
+claims its batch with a single ``UPDATE ... RETURNING``, and only while no
+other worker holds an unexpired claim on pending bills, so bills are never
+synced twice or out of order. A claim expires after ``claim_ttl`` seconds, so
+the bills of a worker that died are picked up by the next one.
+
+Environment:
+    BILL_JOURNAL                  journal file (off when unset); keep it outside the checkout,
+                                  which a deploy replaces, e.g. /var/lib/pos-system/bill_journal.db
+    BILL_JOURNAL_BATCH_SIZE       bills read per sync pass (default 50)
+    BILL_JOURNAL_MAX_ATTEMPTS     attempts before a bill is parked as failed (default 20)
+    BILL_JOURNAL_RETENTION_DAYS   days synced bills are kept for inspection (default 7)
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("autospa.journal")
+
+SCHEMA = """
+create table if not exists journal (
+    seq integer primary key autoincrement,
+    payload text not null,
+    progress text not null default '{}',
+    status text not null default 'pending',
+    attempts integer not null default 0,
+    last_error text,
+    result text,
+    created_at real not null,
+    synced_at real,
+    claimed_by text,
+    claimed_at real
+);
+create index if not exists ix_journal_status_seq on journal (status, seq);
+create table if not exists journal_meta (key text primary key, value text not null);
+"""
+
+# Columns added after the first release, for journal files created before them
+ADDED_COLUMNS = (("claimed_by", "text"), ("claimed_at", "real"))
+
+
+def journal_path() -> Optional[str]:
+    """Journal file from BILL_JOURNAL; None when journaling is off.
+
+    Opt-in: unsynced bills live only in this file, so it must be on a disk that
+    outlives the process and the deploy (not the checkout, not Vercel's
+    filesystem). A relative path is taken from the working directory.
+    """
+    return os.environ.get("BILL_JOURNAL") or None
+
+
+class JournalEntry:
+    def __init__(self, seq: int, payload: Dict[str, Any], progress: Dict[str, Any], attempts: int,
+                 client_key: Optional[str] = None):
+        self.seq = seq
+        self.payload = payload
+        self.progress = progress
+        self.attempts = attempts
+        # Idempotency key for the billing insert
+        self.client_key = client_key
+
+
+class BillJournal:
+    """Durable FIFO of bills waiting to be written to the backend."""
+
+    def __init__(self, path: str, claim_ttl: float = 300.0):
+        self.path = path
+        self.claim_ttl = claim_ttl
+        # Who holds a claim: unique per BillJournal, so per process
+        self.owner = uuid.uuid4().hex
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("pragma journal_mode=wal")
+        self._conn.execute("pragma synchronous=full")
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("pragma table_info(journal)")}
+        for name, column_type in ADDED_COLUMNS:
+            if name not in columns:
+                self._conn.execute(f"alter table journal add column {name} {column_type}")
+        # Identifies this journal file in client keys; kept for the life of the file
+        self._conn.execute("insert or ignore into journal_meta (key, value) values ('journal_id', ?)",
+                           (uuid.uuid4().hex,))
+        self.journal_id = self._conn.execute(
+            "select value from journal_meta where key = 'journal_id'").fetchone()[0]
+
+    def client_key(self, seq: int) -> str:
+        return f"{self.journal_id}-{seq}"
+
+    def _execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def _append(self, payload: Dict[str, Any]) -> int:
+        cursor = self._execute(
+            "insert into journal (payload, created_at) values (?, ?)",
+            (json.dumps(payload, separators=(",", ":")), time.time()),
+        )
+        return cursor.lastrowid
+
+    async def append(self, payload: Dict[str, Any]) -> int:
+        """Durably record a bill and return its sequence number."""
+        return await asyncio.to_thread(self._append, payload)
+
+    def _claim(self, limit: int) -> List[JournalEntry]:
+        # One statement, so two processes cannot both pass the "no live claim" check
+        now = time.time()
+        rows = self._execute(
+            """
+            update journal set claimed_by = :owner, claimed_at = :now
+            where seq in (select seq from journal where status = 'pending' order by seq limit :limit)
+              and not exists (select 1 from journal
+                              where status = 'pending' and claimed_by != :owner and claimed_at > :expired)
+            returning seq, payload, progress, attempts
+            """,
+            {"owner": self.owner, "now": now, "limit": limit, "expired": now - self.claim_ttl},
+        ).fetchall()
+        return [JournalEntry(seq, json.loads(payload), json.loads(progress), attempts, self.client_key(seq))
+                for seq, payload, progress, attempts in sorted(rows)]
+
+    async def claim(self, limit: int = 50) -> List[JournalEntry]:
+        """Claim the first ``limit`` pending bills in order; empty while another
+        process holds a live claim (or nothing is pending)."""
+        return await asyncio.to_thread(self._claim, limit)
+
+    async def release(self) -> None:
+        """Drop this process's claims so another process can sync without waiting for them to expire."""
+        await asyncio.to_thread(
+            self._execute, "update journal set claimed_by = null where claimed_by = ? and status = 'pending'",
+            (self.owner,),
+        )
+
+    def _execute_many(self, sql: str, params: List[tuple]) -> None:
+        # One transaction, so a batch costs a single fsync
+        with self._lock:
+            self._conn.execute("begin")
+            try:
+                self._conn.executemany(sql, params)
+            except BaseException:
+                self._conn.execute("rollback")
+                raise
+            self._conn.execute("commit")
+
+    async def save_progress(self, progress: List[Tuple[int, Dict[str, Any]]]) -> None:
+        """Persist (seq, progress) for a batch of bills."""
+        await asyncio.to_thread(
+            self._execute_many, "update journal set progress = ? where seq = ?",
+            [(json.dumps(entry_progress, default=str), seq) for seq, entry_progress in progress],
+        )
+
+    async def mark_synced(self, results: List[Tuple[int, Dict[str, Any]]]) -> None:
+        """Mark (seq, result) pairs as synced."""
+        now = time.time()
+        await asyncio.to_thread(
+            self._execute_many,
+            "update journal set status = 'synced', result = ?, last_error = null, synced_at = ? where seq = ?",
+            [(json.dumps(result, default=str), now, seq) for seq, result in results],
+        )
+
+    async def mark_attempt_failed(self, seq: int, error: str, give_up: bool) -> None:
+        await asyncio.to_thread(
+            self._execute,
+            "update journal set attempts = attempts + 1, last_error = ?, status = ?, claimed_by = null where seq = ?",
+            (error, "failed" if give_up else "pending", seq),
+        )
+
+    async def requeue_failed(self) -> int:
+        """Move parked bills back into the queue (in their original order); returns how many."""
+        cursor = await asyncio.to_thread(
+            self._execute, "update journal set status = 'pending', attempts = 0 where status = 'failed'"
+        )
+        return cursor.rowcount
+
+    async def prune(self, retention_days: float) -> int:
+        cursor = await asyncio.to_thread(
+            self._execute,
+            "delete from journal where status = 'synced' and synced_at < ?",
+            (time.time() - retention_days * 86400,),
+        )
+        return cursor.rowcount
+
+    def _status(self) -> Dict[str, Any]:
+        counts = dict(self._execute("select status, count(*) from journal group by status").fetchall())
+        oldest = self._execute(
+            "select seq, created_at, attempts, last_error from journal where status = 'pending' order by seq limit 1"
+        ).fetchone()
+        claimed_elsewhere = self._execute(
+            "select count(*) from journal where status = 'pending' and claimed_by != ? and claimed_at > ?",
+            (self.owner, time.time() - self.claim_ttl),
+        ).fetchone()[0]
+        last_failed = self._execute(
+            "select seq, last_error from journal where status = 'failed' order by seq desc limit 1"
+        ).fetchone()
+        status = {
+            "pending": counts.get("pending", 0),
+            "failed": counts.get("failed", 0),
+            "synced": counts.get("synced", 0),
+            # Pending bills another process is syncing
+            "claimed_elsewhere": claimed_elsewhere,
+            "oldest_pending": None,
+            "last_failed": None,
+        }
+        if oldest:
+            seq, created_at, attempts, last_error = oldest
+            status["oldest_pending"] = {
+                "seq": seq,
+                "age_seconds": round(time.time() - created_at, 1),
+                "attempts": attempts,
+                "last_error": last_error,
+            }
+        if last_failed:
+            status["last_failed"] = {"seq": last_failed[0], "error": last_failed[1]}
+        return status
+
+    async def status(self) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._status)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class JournalSyncWorker:
+    """Background task that replays journaled bills through ``apply(entries)`` in order.
+
+    ``apply`` takes a batch of entries and returns one result per entry.
+    """
+
+    def __init__(
+        self,
+        journal: BillJournal,
+        apply: Callable[[List[JournalEntry]], Awaitable[List[Dict[str, Any]]]],
+        *,
+        batch_size: int = 50,
+        max_attempts: int = 20,
+        retention_days: float = 7,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+    ):
+        self.journal = journal
+        self.apply = apply
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retention_days = retention_days
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_at: Optional[float] = None
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._failures = 0
+        # After a failed batch, bills are retried one at a time until the head syncs
+        self._isolate = False
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="bill-journal-sync")
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def stop(self, drain_timeout: float = 5.0) -> None:
+        """Give the worker ``drain_timeout`` seconds to flush, then cancel it; unsynced bills stay journaled."""
+        if self._task is None:
+            return
+        self.wake()
+        try:
+            await asyncio.wait_for(self.drain(), drain_timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.journal.release()
+
+    async def drain(self) -> None:
+        """Wait until no bill is pending (parked failures do not count)."""
+        while (await self.journal.status())["pending"]:
+            self.wake()
+            await asyncio.sleep(0.05)
+
+    async def sync_once(self) -> bool:
+        """Sync the next batch in order; returns False if it failed and should be retried later."""
+        entries = await self.journal.claim(1 if self._isolate else self.batch_size)
+        if not entries:
+            return True
+        try:
+            results = await self.apply(entries)
+        except Exception as e:
+            head = entries[0]
+            # Only a bill tried on its own can be blamed (and eventually parked)
+            give_up = len(entries) == 1 and head.attempts + 1 >= self.max_attempts
+            await self.journal.mark_attempt_failed(head.seq, str(e), give_up)
+            self._isolate = True
+            if give_up:
+                logger.error("Giving up on journaled bill %s after %d attempts: %s", head.seq, head.attempts + 1, e)
+                return True
+            logger.warning("Journaled bills %s..%s failed to sync (attempt %d): %s",
+                           head.seq, entries[-1].seq, head.attempts + 1, e)
+            # Later bills wait so the backend sees them in the order they were rung up
+            return False
+        await self.journal.mark_synced([(entry.seq, result) for entry, result in zip(entries, results)])
+        self._isolate = False
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                ok = await self.sync_once()
+            except Exception as e:
+                logger.error("Bill journal sync pass failed: %s", e, exc_info=True)
+                ok = False
+
+            if ok:
+                self._failures = 0
+                self.retry_at = None
+                # Clear before looking, so a bill appended from here on leaves the event set
+                self._wake.clear()
+                status = await self.journal.status()
+                if status["pending"]:
+                    if status["claimed_elsewhere"]:
+                        # Another process is syncing; look again once its batch is likely done
+                        await asyncio.sleep(self.backoff)
+                    continue
+                await self.journal.prune(self.retention_days)
+                await self._wake.wait()
+            else:
+                self._failures += 1
+                delay = min(self.max_backoff, self.backoff * 2 ** (self._failures - 1))
+                self.retry_at = time.time() + delay
+                # New bills do not cut the backoff short; the head bill must sync first anyway
+                await asyncio.sleep(delay)
@@ -0,0 +1,154 @@
+import asyncio
+import bisect
+import hashlib
+import itertools
+import json
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from cachetools import TTLCache
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def row_hash(row: Dict[str, Any]) -> int:
+    if orjson is not None:
+        payload = orjson.dumps(row, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str)
+    else:
+        payload = json.dumps(row, sort_keys=True, default=str).encode()
+    return int.from_bytes(hashlib.blake2b(payload, digest_size=12).digest(), "big")
+
+
+class CatalogEntry:
+    """Cached rows of one catalog table, keyed by id.
+
+    The ETag is a digest of the rows' content, so every instance serving the
+    same catalog hands out the same tag. It is the XOR of per-row hashes:
+    those are computed the first time the ETag is asked for, and after that a
+    write only rehashes the rows it changed.
+    """
+
+    def __init__(self, rows: Iterable[Dict[str, Any]], version: int):
+        self.rows: Dict[Any, Dict[str, Any]] = {row.get("id"): row for row in rows}
+        self.version = version
+        self._row_hashes: Optional[Dict[Any, int]] = None
+        self._digest = 0
+        self._sorted_ids: Optional[List[Any]] = None
+        self._by_code: Optional[Dict[Any, Dict[str, Any]]] = None
+
+    @property
+    def etag(self) -> str:
+        if self._row_hashes is None:
+            self._row_hashes = {row_id: row_hash(row) for row_id, row in self.rows.items()}
+            self._digest = 0
+            for value in self._row_hashes.values():
+                self._digest ^= value
+        return '"%024x"' % self._digest
+
+    def set_rows(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Store whole rows (keyed by their id), keeping the digest current."""
+        for row in rows:
+            row_id = row.get("id")
+            self.rows[row_id] = row
+            if self._row_hashes is not None:
+                value = row_hash(row)
+                self._digest ^= self._row_hashes.get(row_id, 0) ^ value
+                self._row_hashes[row_id] = value
+
+    def values(self) -> List[Dict[str, Any]]:
+        return list(self.rows.values())
+
+    def page(self, limit: int, after: Any = None) -> List[Dict[str, Any]]:
+        """Keyset page of rows ordered by id, starting after ``after``."""
+        if self._sorted_ids is None:
+            self._sorted_ids = sorted(self.rows)
+        start = 0 if after is None else bisect.bisect_right(self._sorted_ids, after)
+        return [self.rows[row_id] for row_id in self._sorted_ids[start:start + limit]]
+
+    def by_code(self) -> Dict[Any, Dict[str, Any]]:
+        """Rows keyed by ``code``, built on first use."""
+        if self._by_code is None:
+            self._by_code = {row.get("code"): row for row in self.rows.values() if row.get("code")}
+        return self._by_code
+
+    def touch(self, version: int) -> None:
+        self.version = version
+        self._sorted_ids = None
+        self._by_code = None
+
+
+class CatalogCache:
+    """Versioned in-process cache for the products and services tables.
+
+    Entries expire after ``ttl`` seconds and tables larger than ``max_rows``
+    are never cached. Writes go through ``upsert``/``apply_stock`` so cached
+    rows stay current without a reload; ``invalidate`` drops a table.
+    """
+
+    def __init__(self, ttl: float = 300, maxsize: int = 8, max_rows: int = 50000):
+        self._entries: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Tables last seen with more than max_rows rows; rechecked after ttl
+        self._oversized: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._generation: Dict[str, int] = {}
+        self._versions = itertools.count(1)
+        self.max_rows = max_rows
+
+    async def get(self, table: str, loader: Callable[[], Awaitable[List[Dict[str, Any]]]]) -> CatalogEntry:
+        entry = self._entries.get(table)
+        if entry is not None:
+            return entry
+
+        # One loader per table; concurrent misses wait for the same fetch
+        lock = self._locks.setdefault(table, asyncio.Lock())
+        async with lock:
+            entry = self._entries.get(table)
+            if entry is not None:
+                return entry
+
+            generation = self._generation.get(table, 0)
+            rows = await loader()
+            entry = CatalogEntry(rows, next(self._versions))
+            # Skip caching if a write raced with the load or the table is too big
+            if len(rows) > self.max_rows:
+                self._oversized[table] = len(rows)
+            elif generation == self._generation.get(table, 0):
+                self._entries[table] = entry
+            return entry
+
+    def peek(self, table: str) -> Optional[CatalogEntry]:
+        return self._entries.get(table)
+
+    def oversized(self, table: str) -> bool:
+        """Whether ``table`` was too large to cache when last loaded (within ``ttl``)."""
+        return table in self._oversized
+
+    def invalidate(self, table: str) -> None:
+        self._generation[table] = self._generation.get(table, 0) + 1
+        self._entries.pop(table, None)
+
+    def upsert(self, table: str, rows: Iterable[Dict[str, Any]]) -> None:
+        """Write inserted or updated rows (as returned by PostgREST) into the cache."""
+        self._generation[table] = self._generation.get(table, 0) + 1
+        entry = self._entries.get(table)
+        if entry is None:
+            return
+        rows = list(rows)
+        if any(row.get("id") is None for row in rows):
+            # Can't place a row without its id - reload on next read
+            self._entries.pop(table, None)
+            return
+        entry.set_rows({**entry.rows.get(row["id"], {}), **row} for row in rows)
+        entry.touch(next(self._versions))
+
+    def apply_stock(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Apply ``{"id", "quantity"}`` results of a stock decrement to cached products."""
+        self._generation['products'] = self._generation.get('products', 0) + 1
+        entry = self._entries.get('products')
+        if entry is None:
+            return
+        entry.set_rows({**entry.rows[row["id"]], "quantity": row["quantity"]}
+                       for row in rows if row["id"] in entry.rows)
+        entry.touch(next(self._versions))
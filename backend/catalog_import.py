@@ -0,0 +1,225 @@
+"""Streaming bulk import/export for the product and service catalogs.
+
+Uploads (CSV with a header row, or NDJSON) are decoded and parsed as the body
+arrives, each row is validated with the same model as the single-item
+endpoint, and valid rows are written in chunked multi-row upserts keyed on
+``code`` while the next chunk is still being parsed. The result is a report
+with one entry per rejected row. Exports stream the cached catalog back out
+in either format, in a shape the import accepts.
+"""
+import asyncio
+import codecs
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+# Rows per upsert request
+IMPORT_CHUNK_SIZE = 500
+# Rejected rows listed in the report; the count is always exact
+MAX_REPORTED_ERRORS = 1000
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a UTF-8 byte stream (optionally BOM-prefixed) into lines, keeping line endings."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.splitlines(keepends=True)
+        # The last piece may be a partial line (or a "\r" whose "\n" is in the
+        # next chunk); keep it for the next chunk
+        pending = lines.pop() if lines and not lines[-1].endswith("\n") else ""
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def iter_csv_records(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (line number, row dict) per CSV record; the first record is the header.
+
+    A record continues over line breaks while it has an unbalanced quote, so
+    quoted fields may contain newlines. Malformed records yield (line, str error).
+    """
+    header: Optional[List[str]] = None
+    record = ""
+    start = 0
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if not record:
+            start = line_no
+        record += line
+        if record.count('"') % 2:
+            continue
+        text, record = record, ""
+        if not text.strip():
+            continue
+        try:
+            values = next(csv.reader(io.StringIO(text)))
+        except csv.Error as e:
+            yield start, f"Malformed CSV: {e}"
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        yield start, dict(zip(header, values))
+    if record.strip():
+        yield start, "Malformed CSV: unterminated quoted field"
+
+
+async def iter_ndjson_records(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (line number, row dict) per NDJSON line; bad lines yield (line, str error)."""
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_no, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield line_no, "Expected a JSON object"
+            continue
+        yield line_no, row
+
+
+def clean_csv_values(row: Dict[str, Any]) -> Dict[str, Any]:
+    # CSV has no null: empty cells fall back to the model's defaults
+    return {key: value.strip() if isinstance(value, str) else value
+            for key, value in row.items() if key and value not in ("", None)}
+
+
+class ImportReport:
+    def __init__(self):
+        self.received = 0
+        self.upserted = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def reject(self, line: int, code: Optional[str], errors: List[str]) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "code": code, "errors": errors})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "received": self.received,
+            "upserted": self.upserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+async def import_catalog(
+    records: AsyncIterator[Tuple[int, Any]],
+    model: Type[BaseModel],
+    to_row: Callable[[BaseModel], Dict[str, Any]],
+    upsert: Callable[[List[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]],
+    on_written: Callable[[List[Dict[str, Any]]], None],
+    *,
+    clean: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+) -> Dict[str, Any]:
+    """Validate ``records`` with ``model`` and upsert them ``chunk_size`` rows at a time.
+
+    One upsert is in flight while the next chunk is parsed; ``on_written``
+    receives the rows each upsert returned (e.g. to refresh a cache).
+    """
+    report = ImportReport()
+    # code -> (line, row); a later row for the same code replaces the earlier one
+    chunk: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+    in_flight: Optional[asyncio.Task] = None
+
+    async def write_group(rows: Dict[str, Tuple[int, Dict[str, Any]]]) -> None:
+        try:
+            written = await upsert([row for _, row in rows.values()])
+        except Exception as e:
+            for code, (line, _) in rows.items():
+                report.reject(line, code, [f"Write failed: {e}"])
+            return
+        report.upserted += len(rows)
+        on_written(written)
+
+    async def write(rows: Dict[str, Tuple[int, Dict[str, Any]]]) -> None:
+        # An upsert takes rows with the same columns; rows leaving out an optional
+        # column (so its stored value is kept) go in their own upsert
+        groups: Dict[Tuple[str, ...], Dict[str, Tuple[int, Dict[str, Any]]]] = {}
+        for code, (line, row) in rows.items():
+            groups.setdefault(tuple(row), {})[code] = (line, row)
+        for group in groups.values():
+            await write_group(group)
+
+    async def flush() -> None:
+        nonlocal chunk, in_flight
+        if in_flight is not None:
+            await in_flight
+            in_flight = None
+        if chunk:
+            in_flight = asyncio.create_task(write(chunk))
+            chunk = {}
+
+    try:
+        async for line, record in records:
+            report.received += 1
+            if isinstance(record, str):
+                report.reject(line, None, [record])
+                continue
+            if clean is not None:
+                record = clean(record)
+            try:
+                item = model.model_validate(record)
+            except ValidationError as e:
+                report.reject(line, record.get("code"), [
+                    f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+                ])
+                continue
+            row = to_row(item)
+            if row["code"] in chunk:
+                # Superseded by this later row for the same code; both count as applied
+                report.upserted += 1
+            chunk[row["code"]] = (line, row)
+            if len(chunk) >= chunk_size:
+                await flush()
+        await flush()
+        if in_flight is not None:
+            await in_flight
+    finally:
+        if in_flight is not None and not in_flight.done():
+            in_flight.cancel()
+    return report.as_dict()
+
+
+def export_csv(rows: Iterable[Dict[str, Any]], columns: List[str], batch: int = 500) -> Iterable[str]:
+    """Yield CSV text (header first) ``batch`` rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % batch == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_ndjson(rows: Iterable[Dict[str, Any]], columns: List[str], batch: int = 500) -> Iterable[str]:
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({column: row.get(column) for column in columns}, default=str) + "\n")
+        if len(lines) >= batch:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
@@ -0,0 +1,95 @@
+"""Server-Sent Events feed of catalog, stock and billing changes.
+
+Screens that keep a local copy of the catalog subscribe to ``/api/changes``
+instead of polling ``get_all_data``. Every change is published once, with a
+sequence number, and kept in a bounded in-memory buffer. Each event is
+encoded to its SSE frame once, however many clients are connected.
+
+The event id is ``<epoch>-<seq>``, where the epoch changes on every restart.
+A client that reconnects with ``Last-Event-ID`` (or ``?after=``) gets the
+events it missed. If its id is from another epoch, or is older than the
+buffer, it gets a ``reset`` event instead and should reload the snapshot. A
+fresh subscription starts with a ``ready`` event carrying the current id;
+load the snapshot after it arrives and no change is lost in between.
+"""
+import asyncio
+import itertools
+import json
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, List, Optional, Tuple
+
+# Events kept for reconnecting clients
+DEFAULT_CAPACITY = 10000
+# Seconds between keep-alive comments, so proxies do not drop idle streams
+HEARTBEAT_SECONDS = 15.0
+# Milliseconds a disconnected EventSource waits before reconnecting
+RETRY_MS = 3000
+
+
+def sse_frame(kind: str, event_id: str, data: Any) -> str:
+    payload = json.dumps(data, default=str, separators=(",", ":"))
+    return f"id: {event_id}\nevent: {kind}\ndata: {payload}\n\n"
+
+
+class ChangeFeed:
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.epoch = format(time.time_ns(), "x")
+        self.seq = 0
+        # (seq, frame); sequence numbers are consecutive
+        self._events: Deque[Tuple[int, str]] = deque(maxlen=capacity)
+        self._published = asyncio.Event()
+
+    @property
+    def cursor(self) -> str:
+        return f"{self.epoch}-{self.seq}"
+
+    def publish(self, kind: str, data: Any) -> int:
+        """Append an event and wake every subscriber; returns its sequence number."""
+        self.seq += 1
+        self._events.append((self.seq, sse_frame(kind, f"{self.epoch}-{self.seq}", data)))
+        published, self._published = self._published, asyncio.Event()
+        published.set()
+        return self.seq
+
+    def _parse(self, cursor: Optional[str]) -> Optional[int]:
+        epoch, _, seq = (cursor or "").strip().rpartition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def since(self, seq: int) -> Optional[List[Tuple[int, str]]]:
+        """Events after ``seq``, or None if some of them are no longer buffered."""
+        if seq > self.seq:
+            return None
+        oldest = self._events[0][0] if self._events else self.seq + 1
+        if seq < oldest - 1:
+            return None
+        return list(itertools.islice(self._events, seq - oldest + 1, None))
+
+    async def stream(self, after: Optional[str] = None, heartbeat: float = HEARTBEAT_SECONDS) -> AsyncIterator[str]:
+        """SSE text for one subscriber, starting after the ``after`` event id."""
+        yield f"retry: {RETRY_MS}\n\n"
+        position = self._parse(after)
+        if after is None:
+            position = self.seq
+            yield sse_frame("ready", self.cursor, {"cursor": self.cursor})
+        elif position is None or self.since(position) is None:
+            position = self.seq
+            yield sse_frame("reset", self.cursor, {"cursor": self.cursor})
+        while True:
+            events = self.since(position)
+            if events is None:
+                # This client fell further behind than the buffer reaches
+                position = self.seq
+                yield sse_frame("reset", self.cursor, {"cursor": self.cursor})
+                continue
+            for seq, frame in events:
+                position = seq
+                yield frame
+            if position < self.seq:
+                continue
+            try:
+                await asyncio.wait_for(self._published.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
@@ -0,0 +1,115 @@
+"""One-off merge of duplicate customer rows.
+
+Until customers were keyed on (mobile, vehicle), submit_bill wrote a new
+customer row for every bill. This job reads the whole table, groups the rows
+by ``customer_key`` and folds each group into one row: bills are re-pointed at
+the kept row and the other rows deleted. The kept row gets the key, the latest
+non-blank name and company, the summed ``payment`` and the last
+``payment_date``. Rows with neither a mobile nor a vehicle number are left
+alone.
+
+    python customer_dedup.py             # dry run, only reports
+    python customer_dedup.py --apply
+
+Run sql/customers.sql on Supabase first. The job can be re-run, and the API
+may keep running meanwhile: a row keyed by a new bill is kept in preference
+to the planned one, so customer ids the API has cached stay valid. Running
+APIs drop the deleted rows from customer search at their next full index
+reload (CUSTOMER_INDEX_RELOAD).
+"""
+import argparse
+import asyncio
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+from customer_index import customer_key
+
+# Merges per backend call
+MERGE_BATCH_SIZE = 500
+
+
+def _latest(group: List[Dict[str, Any]], column: str) -> Optional[str]:
+    # Newest non-blank value; the group is in id order
+    for row in reversed(group):
+        if str(row.get(column) or "").strip():
+            return row[column]
+    return None
+
+
+def plan_merges(rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """One merge (see ``Repository.merge_customers``) per customer that has
+    duplicate rows or is not keyed yet."""
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows:
+        key = customer_key(row.get("mobile_no"), row.get("vehicel_no"))
+        if key:
+            groups.setdefault(key, []).append(row)
+
+    merges = []
+    for key, group in groups.items():
+        if len(group) == 1 and group[0].get("customer_key") == key:
+            continue
+        group.sort(key=lambda row: row["id"])
+        # Keep the row the API already keyed (its id may be cached), else the oldest
+        keep = next((row for row in group if row.get("customer_key") == key), group[0])
+        payments = [row["payment"] for row in group if row.get("payment") is not None]
+        dates = [row["payment_date"] for row in group if row.get("payment_date")]
+        merges.append({
+            "id": keep["id"],
+            "duplicates": [row["id"] for row in group if row is not keep],
+            "customer_key": key,
+            "name": _latest(group, "name") or keep.get("name"),
+            "company": _latest(group, "company") or keep.get("company"),
+            "payment": sum(payments) if payments else None,
+            "payment_date": max(dates) if dates else None,
+        })
+    return merges
+
+
+async def dedup(repo, apply: bool = False, batch_size: int = MERGE_BATCH_SIZE) -> Dict[str, int]:
+    rows = []
+    async for page in repo.iter_customers(named=False):
+        rows.extend(page)
+    merges = plan_merges(rows)
+    stats = {
+        "rows": len(rows),
+        "merges": len(merges),
+        "duplicates": sum(len(merge["duplicates"]) for merge in merges),
+        "removed": 0,
+    }
+    if apply:
+        for start in range(0, len(merges), batch_size):
+            stats["removed"] += await repo.merge_customers(merges[start:start + batch_size])
+            print(f"Merged {min(start + batch_size, len(merges))}/{len(merges)} customers")
+    return stats
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Merge duplicate customer rows")
+    parser.add_argument("--apply", action="store_true", help="Write the merges (default: dry run)")
+    parser.add_argument("--batch-size", type=int, default=MERGE_BATCH_SIZE, help="Merges per backend call")
+    args = parser.parse_args(argv)
+
+    async def run():
+        if os.environ.get("STORAGE_BACKEND", "supabase").lower() == "sql":
+            from sql_repository import SqlRepository
+            repo = SqlRepository(os.environ.get("DATABASE_URL", "sqlite:///./autospa.db"))
+        else:
+            from repository import SupabaseRepository
+            repo = SupabaseRepository(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+        try:
+            stats = await dedup(repo, args.apply, args.batch_size)
+        finally:
+            await repo.aclose()
+        print(f"{stats['rows']} customer rows, {stats['merges']} customers to key or merge, "
+              f"{stats['duplicates']} duplicate rows")
+        if args.apply:
+            print(f"Removed {stats['removed']} rows")
+        else:
+            print("Dry run; re-run with --apply to write")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""In-memory search index for customer autocomplete.
+
+Each searchable value is kept in a sorted array, so a prefix lookup is two
+bisects plus a bounded slice, however large the table is:
+
+- mobile: the digits, and the digits reversed so the last digits of a number
+  also match ("4567" finds 0771234567)
+- vehicle: the letters and digits uppercased ("cab1234" finds CAB-1234), plus
+  each letter/digit run on its own ("1234" finds CAB-1234)
+- name: the lowercased name and each word in it
+
+Results for the same (mobile, vehicle) pair are collapsed to the latest
+customer row, since rows written before customers were deduplicated (see
+customer_dedup.py) may repeat a customer once per visit.
+
+Rows written by this process (``add``) replace their previous entry, so a new
+name or company is searchable at once. New rows from other instances are
+picked up every ``refresh_interval``; edits made elsewhere and rows deleted by
+customer_dedup disappear at the next full reload, every ``reload_interval``.
+"""
+import asyncio
+import bisect
+import gc
+import logging
+import re
+import time
+from operator import itemgetter
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("autospa.customers")
+
+FIELDS = ("mobile", "vehicle", "name")
+
+# Match quality, best first
+EXACT, PREFIX, TOKEN = 0, 1, 2
+
+_TOKEN = re.compile(r"[A-Z]+|[0-9]+")
+
+
+def normalize_mobile(value: Any) -> str:
+    return re.sub(r"\D", "", str(value or ""))
+
+
+def normalize_vehicle(value: Any) -> str:
+    return re.sub(r"[^0-9A-Z]", "", str(value or "").upper())
+
+
+def normalize_name(value: Any) -> str:
+    return " ".join(str(value or "").lower().split())
+
+
+def customer_key(mobile: Any, vehicle: Any) -> Optional[str]:
+    """Identity of a customer: normalized "<mobile>|<vehicle>", or None when both are blank."""
+    mobile, vehicle = normalize_mobile(mobile), normalize_vehicle(vehicle)
+    return f"{mobile}|{vehicle}" if mobile or vehicle else None
+
+
+class SortedKeys:
+    """Sorted (key, id, quality) entries supporting prefix range scans."""
+
+    def __init__(self):
+        self.keys: List[str] = []
+        self.entries: List[Tuple[int, int]] = []
+
+    def add(self, key: str, customer_id: int, quality: int) -> None:
+        if not key:
+            return
+        position = bisect.bisect_right(self.keys, key)
+        self.keys.insert(position, key)
+        self.entries.insert(position, (customer_id, quality))
+
+    def bulk_load(self, pairs: List[Tuple[str, Tuple[int, int]]]) -> None:
+        """Merge (key, (id, quality)) pairs in with one sort."""
+        pairs.extend(zip(self.keys, self.entries))
+        pairs.sort(key=itemgetter(0))
+        self.keys = list(map(itemgetter(0), pairs))
+        self.entries = list(map(itemgetter(1), pairs))
+
+    def remove(self, key: str, customer_id: int) -> None:
+        lo = bisect.bisect_left(self.keys, key)
+        hi = bisect.bisect_right(self.keys, key, lo)
+        for position in range(lo, hi):
+            if self.entries[position][0] == customer_id:
+                del self.keys[position]
+                del self.entries[position]
+                return
+
+    def prefix(self, query: str, cap: int) -> Iterable[Tuple[str, int, int]]:
+        lo = bisect.bisect_left(self.keys, query)
+        hi = bisect.bisect_left(self.keys, query + "\uffff", lo)
+        for position in range(lo, min(hi, lo + cap)):
+            customer_id, quality = self.entries[position]
+            yield self.keys[position], customer_id, quality
+
+
+class CustomerIndex:
+    def __init__(self, refresh_interval: float = 60.0, reload_interval: float = 3600.0):
+        self.customers: Dict[int, Dict[str, Any]] = {}
+        self.max_id = 0
+        self.refresh_interval = refresh_interval
+        self.reload_interval = reload_interval
+        self.refreshed_at = 0.0
+        self.loaded_at = 0.0
+        # Rows add()ed while a full load is running, re-applied on top of it
+        self._added_during_load: Optional[Dict[int, Dict[str, Any]]] = None
+        self._reload_task: Optional[asyncio.Task] = None
+        self._keys = {field: SortedKeys() for field in FIELDS}
+        self._mobile_reversed = SortedKeys()
+        self._warm_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._warm_task is not None and self._warm_task.done() and not self._warm_task.exception()
+
+    def __len__(self) -> int:
+        return len(self.customers)
+
+    def _entries(self, row: Dict[str, Any]) -> Iterable[Tuple[str, str, int]]:
+        """(field, key, quality) for every searchable key of a customer row."""
+        mobile = normalize_mobile(row.get("mobile_no"))
+        yield "mobile", mobile, PREFIX
+        yield "mobile_reversed", mobile[::-1], TOKEN
+        vehicle = normalize_vehicle(row.get("vehicel_no"))
+        yield "vehicle", vehicle, PREFIX
+        tokens = _TOKEN.findall(str(row.get("vehicel_no") or "").upper())
+        if len(tokens) > 1:
+            for token in tokens:
+                yield "vehicle", token, TOKEN
+        name = normalize_name(row.get("name"))
+        yield "name", name, PREFIX
+        words = name.split()
+        if len(words) > 1:
+            for word in words[1:]:
+                yield "name", word, TOKEN
+
+    def _keyset(self, field: str) -> SortedKeys:
+        return self._mobile_reversed if field == "mobile_reversed" else self._keys[field]
+
+    def _record(self, row: Dict[str, Any]) -> Optional[int]:
+        if row.get("id") is None:
+            return None
+        customer_id = row["id"]
+        previous = self.customers.get(customer_id)
+        if previous is not None:
+            # Replace: drop the keys of the stored version first
+            for field, key, _ in self._entries(previous):
+                if key:
+                    self._keyset(field).remove(key, customer_id)
+        self.customers[customer_id] = {
+            "id": customer_id,
+            "name": row.get("name"),
+            "mobile_no": row.get("mobile_no"),
+            "vehicel_no": row.get("vehicel_no"),
+            "company": row.get("company"),
+        }
+        self.max_id = max(self.max_id, customer_id)
+        return customer_id
+
+    def add(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Index customer rows written by submit_bill, replacing any stored version."""
+        for row in rows:
+            if self._added_during_load is not None and row.get("id") is not None:
+                self._added_during_load[row["id"]] = row
+            customer_id = self._record(row)
+            if customer_id is not None:
+                for field, key, quality in self._entries(row):
+                    self._keyset(field).add(key, customer_id, quality)
+
+    def _bulk_add(self, rows: List[Dict[str, Any]]) -> None:
+        pending: Dict[str, List[Tuple[str, Tuple[int, int]]]] = {}
+        for row in rows:
+            if row.get("id") in self.customers:
+                # Already indexed (e.g. by submit_bill during the refresh): replace it
+                self.add([row])
+                continue
+            customer_id = self._record(row)
+            if customer_id is not None:
+                for field, key, quality in self._entries(row):
+                    if key:
+                        pending.setdefault(field, []).append((key, (customer_id, quality)))
+        for field, pairs in pending.items():
+            self._keyset(field).bulk_load(pairs)
+
+    def _bulk_add_quietly(self, rows: List[Dict[str, Any]]) -> None:
+        # Millions of small tuples: pausing the cyclic GC roughly halves the build time
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self._bulk_add(rows)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    async def _load(self, pages: AsyncIterator[List[Dict[str, Any]]]) -> None:
+        # The current index keeps serving until the new one is swapped in
+        self._added_during_load = {}
+        try:
+            rows: List[Dict[str, Any]] = []
+            async for page in pages:
+                rows.extend(page)
+            # Build off the event loop (one sort per key array), then swap it in and
+            # re-add the customers submit_bill indexed in the meantime
+            fresh = CustomerIndex(self.refresh_interval, self.reload_interval)
+            await asyncio.to_thread(fresh._bulk_add_quietly, rows)
+            added_meanwhile = list(self._added_during_load.values())
+        finally:
+            self._added_during_load = None
+        self.customers, self.max_id = fresh.customers, fresh.max_id
+        self._keys, self._mobile_reversed = fresh._keys, fresh._mobile_reversed
+        self.add(added_meanwhile)
+        self.refreshed_at = self.loaded_at = time.monotonic()
+
+    def warm(self, pages: AsyncIterator[List[Dict[str, Any]]]) -> asyncio.Task:
+        """Start loading the whole table in the background."""
+        if self._warm_task is None:
+            self._warm_task = asyncio.create_task(self._load(pages), name="customer-index-warm")
+        return self._warm_task
+
+    async def ensure_fresh(self, loader: Callable[[Optional[int]], AsyncIterator[List[Dict[str, Any]]]]) -> None:
+        """Wait for the warm-up (starting it if needed), then pick up customers other
+        instances inserted since the last refresh, at most once per ``refresh_interval``."""
+        if self._warm_task is None or (self._warm_task.done() and self._warm_task.exception()):
+            # Not started yet, or the last warm-up failed: (re)load from scratch
+            self._warm_task = None
+            self.warm(loader(None))
+        await asyncio.shield(self._warm_task)
+        if (time.monotonic() - self.loaded_at >= self.reload_interval
+                and (self._reload_task is None or self._reload_task.done())):
+            # Full reload in the background: drops merged or deleted rows, picks up edits.
+            # A failed reload is retried after another reload_interval.
+            self.loaded_at = time.monotonic()
+            self._reload_task = asyncio.create_task(self._load(loader(None)), name="customer-index-reload")
+            self._reload_task.add_done_callback(self._reload_done)
+        if time.monotonic() - self.refreshed_at < self.refresh_interval:
+            return
+        async with self._lock:
+            if time.monotonic() - self.refreshed_at < self.refresh_interval:
+                return
+            rows: List[Dict[str, Any]] = []
+            async for page in loader(self.max_id):
+                rows.extend(page)
+            self._bulk_add(rows)
+            self.refreshed_at = time.monotonic()
+
+    @staticmethod
+    def _reload_done(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Customer index reload failed: %s", task.exception())
+
+    def search(self, query: str, field: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """Best matches for ``query`` on one field (mobile, vehicle, name) or all of them."""
+        fields = [field] if field else list(FIELDS)
+        # Look at a bounded slice of each key range, so cost does not grow with the table
+        cap = max(limit * 20, 200)
+        best: Dict[int, int] = {}
+
+        def consider(matches, probe):
+            for key, customer_id, quality in matches:
+                quality = EXACT if key == probe else quality
+                if quality < best.get(customer_id, TOKEN + 1):
+                    best[customer_id] = quality
+
+        for name in fields:
+            if name == "mobile":
+                probe = normalize_mobile(query)
+                if probe:
+                    consider(self._keys["mobile"].prefix(probe, cap), probe)
+                    consider(self._mobile_reversed.prefix(probe[::-1], cap), probe[::-1])
+            elif name == "vehicle":
+                probe = normalize_vehicle(query)
+                if probe:
+                    consider(self._keys["vehicle"].prefix(probe, cap), probe)
+            else:
+                probe = normalize_name(query)
+                if probe:
+                    consider(self._keys["name"].prefix(probe, cap), probe)
+
+        results = []
+        seen = set()
+        # Best match first, then the most recent row
+        for customer_id, _ in sorted(best.items(), key=lambda item: (item[1], -item[0])):
+            customer = self.customers[customer_id]
+            identity = customer_key(customer["mobile_no"], customer["vehicel_no"])
+            if identity:
+                if identity in seen:
+                    continue
+                seen.add(identity)
+            results.append(customer)
+            if len(results) >= limit:
+                break
+        return results
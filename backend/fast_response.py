@@ -0,0 +1,178 @@
+"""Fast JSON rendering and response compression for large payloads.
+
+``FastJSONResponse`` encodes with orjson. An endpoint that returns one directly
+also skips FastAPI's ``jsonable_encoder`` pass, which for a month of bills
+costs far more than the encoding itself; its ``response_model`` still
+documents the shape in the OpenAPI schema.
+
+``CompressionMiddleware`` compresses responses of at least ``minimum_size``
+bytes with brotli when the client accepts it and the ``brotli`` package is
+installed, else with gzip. Server-Sent Events are never compressed, so events
+are not held back in the compressor.
+"""
+import json
+import zlib
+from typing import Any
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Streams that must reach the client as they are written
+EXCLUDED_CONTENT_TYPES = ("text/event-stream",)
+
+
+def _default(value: Any) -> Any:
+    # Decimals and other values orjson does not know, as the json fallback does
+    return str(value)
+
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON; datetimes become ISO 8601 strings."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=str, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class CompressingResponder:
+    """Compresses one response as it is sent. The response start is held until
+    the first body chunk shows whether to compress: bodies under
+    ``minimum_size``, responses that already have a Content-Encoding and
+    ``EXCLUDED_CONTENT_TYPES`` go out unchanged.
+
+    Written here rather than on starlette's responders, which differ between
+    the starlette versions FastAPI 0.115 accepts (0.41 has no identity
+    responder and compresses Server-Sent Events)."""
+
+    content_encoding = ""
+
+    def __init__(self, app: ASGIApp, minimum_size: int) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.send: Send = None
+        self.initial_message: Message = {}
+        self.started = False
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_with_compression)
+
+    def compress(self, body: bytes, *, more_body: bool) -> bytes:
+        raise NotImplementedError
+
+    async def send_with_compression(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Held until the first body chunk decides the headers
+            self.initial_message = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = ("content-encoding" in headers
+                                or headers.get("content-type", "").startswith(EXCLUDED_CONTENT_TYPES))
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if not self.started:
+            self.started = True
+            if self.passthrough or (len(body) < self.minimum_size and not more_body):
+                self.passthrough = True
+                await self.send(self.initial_message)
+                await self.send(message)
+                return
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            headers["Content-Encoding"] = self.content_encoding
+            headers.add_vary_header("Accept-Encoding")
+            body = self.compress(body, more_body=more_body)
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(body))
+            await self.send(self.initial_message)
+            await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+        elif self.passthrough:
+            await self.send(message)
+        else:
+            await self.send({"type": "http.response.body", "body": self.compress(body, more_body=more_body),
+                             "more_body": more_body})
+
+
+class GZipCompressingResponder(CompressingResponder):
+    content_encoding = "gzip"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, level: int = 6) -> None:
+        super().__init__(app, minimum_size)
+        # wbits 31: gzip header and trailer
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, body: bytes, *, more_body: bool) -> bytes:
+        compressed = self.compressor.compress(body)
+        # Flush each streamed chunk so it reaches the client now, not at the end
+        return compressed + self.compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+
+
+class BrotliResponder(CompressingResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int = 5) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=quality)
+
+    def compress(self, body: bytes, *, more_body: bool) -> bytes:
+        if more_body:
+            return self.compressor.process(body) + self.compressor.flush()
+        return self.compressor.process(body) + self.compressor.finish()
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    """Whether Accept-Encoding lists ``coding`` with a non-zero q-value."""
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.partition(";")
+        if name.strip() == coding:
+            _, _, q = params.replace(" ", "").partition("q=")
+            try:
+                return float(q or 1) > 0
+            except ValueError:
+                return True
+    return False
+
+
+class CompressionMiddleware:
+    """gzip/brotli for responses of at least ``minimum_size`` bytes."""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 5) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        if brotli is not None and _accepts(accept_encoding, "br"):
+            responder = BrotliResponder(self.app, self.minimum_size, self.brotli_quality)
+        elif _accepts(accept_encoding, "gzip"):
+            responder = GZipCompressingResponder(self.app, self.minimum_size, self.gzip_level)
+        else:
+            await self.app(scope, receive, send)
+            return
+        await responder(scope, receive, send)
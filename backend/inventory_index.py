@@ -0,0 +1,136 @@
+"""In-memory low-stock index over the products table.
+
+A product is low on stock when its quantity is below its reorder level: the
+product's ``reorder_level``, or the default threshold when it has none. Low
+products are kept sorted by quantity relative to their reorder level (out of
+stock first), so ``/api/low_stock`` and the summary count need no backend
+call. submit_bill, edit_product, add_products and catalog imports update the
+index as they write. A reload from the backend every ``resync_interval``
+seconds corrects drift, e.g. writes from other instances or edits made
+directly in Supabase.
+"""
+import asyncio
+import bisect
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("autospa.inventory")
+
+# Product columns the index keeps
+FIELDS = ("id", "code", "name", "quantity", "reorder_level")
+
+
+class InventoryIndex:
+    def __init__(self, default_threshold: int = 10, resync_interval: float = 300.0):
+        self.default_threshold = default_threshold
+        self.resync_interval = resync_interval
+        self.synced_at: Optional[float] = None
+        self._products: Dict[Any, Dict[str, Any]] = {}
+        # (quantity / threshold, quantity, id) of low products, most urgent first
+        self._low: List[Tuple[float, int, Any]] = []
+        # Writes seen while a reload is fetching, replayed on top of its result
+        self._pending: Optional[Dict[Any, Dict[str, Any]]] = None
+        self._reload_task: Optional[asyncio.Task] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.synced_at is not None
+
+    @property
+    def low_count(self) -> int:
+        return len(self._low)
+
+    def threshold(self, product: Dict[str, Any]) -> int:
+        level = product.get("reorder_level")
+        return self.default_threshold if level is None else level
+
+    def _rank(self, product: Dict[str, Any]) -> Optional[Tuple[float, int, Any]]:
+        threshold = self.threshold(product)
+        quantity = product.get("quantity") or 0
+        if threshold <= 0 or quantity >= threshold:
+            return None
+        return (quantity / threshold, quantity, product["id"])
+
+    def _set(self, product: Dict[str, Any]) -> None:
+        old = self._products.get(product["id"])
+        rank = self._rank(old) if old is not None else None
+        if rank is not None:
+            del self._low[bisect.bisect_left(self._low, rank)]
+        self._products[product["id"]] = product
+        rank = self._rank(product)
+        if rank is not None:
+            bisect.insort(self._low, rank)
+
+    def _item(self, product: Dict[str, Any]) -> Dict[str, Any]:
+        threshold = self.threshold(product)
+        quantity = product.get("quantity") or 0
+        return {**product, "threshold": threshold, "shortfall": max(0, threshold - quantity)}
+
+    def update(self, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Apply written product rows (full rows, or ``id`` and ``quantity`` after a
+        stock decrement); returns the products that crossed their reorder level,
+        in either direction."""
+        crossings = []
+        for row in rows:
+            if row.get("id") is None:
+                continue
+            fields = {key: row[key] for key in FIELDS if key in row}
+            if self._pending is not None:
+                self._pending[row["id"]] = {**self._pending.get(row["id"], {}), **fields}
+            if not self.loaded:
+                continue
+            old = self._products.get(row["id"])
+            product = {**(old or {}), **fields}
+            self._set(product)
+            if old is not None and (self._rank(old) is None) != (self._rank(product) is None):
+                crossings.append({**self._item(product), "low": self._rank(product) is not None})
+        return crossings
+
+    def low_stock(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Low products, lowest quantity relative to their reorder level first."""
+        entries = self._low if limit is None else self._low[:limit]
+        return [self._item(self._products[product_id]) for _, _, product_id in entries]
+
+    def expire(self) -> None:
+        """Reload on the next use, e.g. after a stock write whose outcome is unknown."""
+        if self.loaded:
+            self.synced_at = float("-inf")
+
+    def _load(self, rows: Iterable[Dict[str, Any]]) -> None:
+        self._products = {row["id"]: {key: row.get(key) for key in FIELDS} for row in rows}
+        self._low = sorted(filter(None, map(self._rank, self._products.values())))
+        self.synced_at = time.monotonic()
+
+    async def _reload(self, loader: Callable[[], Awaitable[List[Dict[str, Any]]]]) -> None:
+        self._pending = {}
+        try:
+            rows = await loader()
+        finally:
+            pending, self._pending = self._pending, None
+        self._load(rows)
+        # The fetch may have started before these writes landed
+        self.update(pending.values())
+
+    def _start_reload(self, loader) -> asyncio.Task:
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = asyncio.create_task(self._reload(loader), name="inventory-resync")
+            self._reload_task.add_done_callback(self._log_failure)
+        return self._reload_task
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Inventory resync failed: %s", task.exception())
+
+    def warm(self, loader: Callable[[], Awaitable[List[Dict[str, Any]]]]) -> None:
+        """Start the first load in the background."""
+        self._start_reload(loader)
+
+    async def ensure_fresh(self, loader: Callable[[], Awaitable[List[Dict[str, Any]]]]) -> None:
+        """Wait for the first load; later, start a background reload once the
+        index is ``resync_interval`` old and keep answering from it meanwhile."""
+        if not self.loaded:
+            await asyncio.shield(self._start_reload(loader))
+        elif time.monotonic() - self.synced_at >= self.resync_interval:
+            self._start_reload(loader)
@@ -0,0 +1,96 @@
+"""Non-blocking logging for the API.
+
+Every logger writes into an in-memory queue through a QueueHandler; a
+QueueListener thread does the formatting and the stream/file I/O, so request
+handlers never wait on disk.
+
+Environment:
+    LOG_LEVEL        root level (default INFO)
+    LOG_LEVELS       per-logger overrides, e.g. "autospa=DEBUG,httpx=INFO"
+    LOG_FILE         rotating log file; defaults to main.log locally, off on Vercel
+    LOG_SAMPLE_RATE  fraction of requests whose INFO/DEBUG lines are kept (default 1.0)
+"""
+import contextvars
+import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Third-party loggers that emit per-frame DEBUG lines (see main.log)
+QUIET_LOGGERS = {
+    "httpcore": logging.WARNING,
+    "hpack": logging.WARNING,
+    "h2": logging.WARNING,
+    "httpx": logging.WARNING,
+    "urllib3": logging.WARNING,
+    "multipart": logging.WARNING,
+}
+
+# Whether the current request's INFO/DEBUG lines are kept; None outside a request
+request_sampled: contextvars.ContextVar[Optional[bool]] = contextvars.ContextVar("request_sampled", default=None)
+
+
+class RequestSamplingFilter(logging.Filter):
+    """Drop INFO/DEBUG records of requests that were not sampled; warnings always pass."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or request_sampled.get() is not False
+
+
+class LazyQueueHandler(QueueHandler):
+    """Enqueue records unformatted; the listener thread does the %-formatting."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    levels = {}
+    for part in spec.split(","):
+        if "=" not in part:
+            continue
+        name, level = part.split("=", 1)
+        levels[name.strip()] = logging.getLevelName(level.strip().upper())
+    return levels
+
+
+def sample_request(rate: float) -> contextvars.Token:
+    """Decide whether the current request is logged; call once per request."""
+    return request_sampled.set(rate >= 1 or random.random() < rate)
+
+
+def configure_logging() -> QueueListener:
+    """Route all logging through a queue and return the started listener."""
+    handlers = [logging.StreamHandler()]
+    log_file = os.environ.get("LOG_FILE")
+    if log_file is None and not os.environ.get("VERCEL"):
+        log_file = os.path.join(os.path.dirname(__file__), "main.log")
+    if log_file:
+        # Rotating log handler (10MB, keep 5 backups)
+        handlers.append(RotatingFileHandler(log_file, maxBytes=10 * 1024 * 1024, backupCount=5))
+    formatter = logging.Formatter(LOG_FORMAT)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(RequestSamplingFilter())
+
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(queue_handler)
+    root_logger.setLevel(logging.getLevelName(os.environ.get("LOG_LEVEL", "INFO").upper()))
+
+    levels = dict(QUIET_LOGGERS)
+    levels.update(parse_levels(os.environ.get("LOG_LEVELS", "")))
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,82 @@
+"""In-process request and backend-call timing.
+
+Route latencies and PostgREST call latencies (by table and operation, e.g.
+``products.select``) are kept as Prometheus histograms and rendered by
+``render_prometheus`` for the ``/metrics`` endpoint. Calls made while serving
+a request are also collected per request for the ``Server-Timing`` header.
+"""
+import bisect
+import contextvars
+from typing import Dict, List, Optional, Tuple
+
+# Seconds; roughly doubling from 2.5ms to 10s
+DEFAULT_BUCKETS = (0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        counts, total = self._series.setdefault(labels, ([0] * (len(self.buckets) + 1), [0.0]))
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._series.items()):
+            label_text = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{label_text},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total[0]}")
+            lines.append(f"{self.name}_count{{{label_text}}} {cumulative}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time to serve an API request", ("method", "route", "status")
+)
+BACKEND_CALL_DURATION = Histogram(
+    "backend_call_duration_seconds", "Time spent in a PostgREST call", ("table", "operation")
+)
+
+# (name, seconds) of backend calls made while serving the current request
+request_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def observe_backend_call(table: str, operation: str, seconds: float) -> None:
+    """Repository observer hook: record one backend call, e.g. ('billing', 'insert')."""
+    BACKEND_CALL_DURATION.observe((table, operation), seconds)
+    timings = request_timings.get()
+    if timings is not None:
+        timings.append((f"{table}.{operation}", seconds))
+
+
+def server_timing_header(total: float, timings: List[Tuple[str, float]]) -> str:
+    """Server-Timing value: total time plus summed time and call count per backend call."""
+    per_call: Dict[str, List[float]] = {}
+    for name, seconds in timings:
+        per_call.setdefault(name, []).append(seconds)
+    entries = [f"total;dur={total * 1000:.1f}"]
+    for name, durations in per_call.items():
+        entries.append(f'{name};dur={sum(durations) * 1000:.1f};desc="{len(durations)} call(s)"')
+    return ", ".join(entries)
+
+
+def render_prometheus() -> str:
+    lines = REQUEST_DURATION.render() + BACKEND_CALL_DURATION.render()
+    return "\n".join(lines) + "\n"
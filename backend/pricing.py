@@ -0,0 +1,113 @@
+"""Server-side bill pricing against the cached catalog.
+
+A line costs ``quantity * (price * (1 - discount / 100))`` and a bill the sum
+of its lines times ``1 - discount / 100`` for the bill discount; ``subTotal``
+is the sum of ``price * quantity``. These are the POS's own expressions
+(Billing.tsx), evaluated in the same order on float64 and never rounded, so a
+bill the POS priced from the same catalog comes out identical.
+
+Catalog lines take their price, name and code from the catalog snapshot
+(``CatalogEntry``, matched on id and then code), so pricing costs no backend
+call while the catalog cache is warm. Custom lines (id 0 or code ``CUSTOM``)
+keep the price the cashier entered. Every line of a batch of bills is priced
+in one pass over NumPy arrays, imported on first use.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+# Largest difference between a client amount and the server's that is not a mismatch
+TOLERANCE = 0.01
+
+CUSTOM_CODE = "CUSTOM"
+
+
+def _np():
+    import numpy
+    return numpy
+
+
+def _id(value: Any) -> Any:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def is_custom(line: Dict[str, Any]) -> bool:
+    return line.get("code") == CUSTOM_CODE or _id(line.get("id")) == 0
+
+
+def resolve(line: Dict[str, Any], catalogs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The catalog row for a line, by id and then by code; None for custom or unknown lines."""
+    catalog = catalogs.get(line.get("type"))
+    if catalog is None or is_custom(line):
+        return None
+    row = catalog.rows.get(_id(line.get("id"))) if line.get("id") is not None else None
+    if row is None and line.get("code"):
+        row = catalog.by_code().get(line["code"])
+    return row
+
+
+def price_bills(bills: List[Tuple[List[Dict[str, Any]], float]], catalogs: Dict[str, Any],
+                default_discounts: bool = False) -> List[Dict[str, Any]]:
+    """Price (lines, bill discount %) pairs against ``catalogs`` ({"product": entry,
+    "service": entry}).
+
+    Returns per bill the priced ``items`` (the input lines with catalog price,
+    name and code and a computed ``total``), ``subTotal``, ``total`` and
+    ``unknown`` (indexes of lines missing from the catalog, which keep the
+    client's price). With ``default_discounts`` a line without a discount
+    takes its product's catalog discount, as the POS does when adding a line.
+    """
+    np = _np()
+    priced_lines: List[Dict[str, Any]] = []
+    bill_index: List[int] = []
+    unknown: List[List[int]] = [[] for _ in bills]
+    for position, (lines, _) in enumerate(bills):
+        for index, line in enumerate(lines):
+            line = dict(line)
+            row = resolve(line, catalogs)
+            if row is not None:
+                line.update(id=row["id"], code=row.get("code"), name=row.get("name"), price=row.get("price") or 0)
+                if default_discounts and line.get("discount") is None:
+                    line["discount"] = row.get("discount") or 0
+            elif not is_custom(line):
+                unknown[position].append(index)
+            line["discount"] = line.get("discount") or 0
+            line["price"] = line.get("price") or 0
+            priced_lines.append(line)
+            bill_index.append(position)
+
+    price = np.array([line["price"] for line in priced_lines], dtype=np.float64)
+    quantity = np.array([line.get("quantity") or 0 for line in priced_lines], dtype=np.float64)
+    discount = np.array([line["discount"] for line in priced_lines], dtype=np.float64)
+    owner = np.array(bill_index, dtype=np.int64)
+    # bincount adds each bill's lines in order from 0, as the POS's reduce() does
+    net = quantity * (price * (1 - discount / 100))
+    sub_totals = np.bincount(owner, weights=price * quantity, minlength=len(bills))
+    line_totals = np.bincount(owner, weights=net, minlength=len(bills))
+    bill_discount = np.array([bill_discount for _, bill_discount in bills], dtype=np.float64)
+    totals = line_totals * (1 - bill_discount / 100)
+
+    results = [{"items": [], "subTotal": float(sub_totals[i]), "total": float(totals[i]), "unknown": unknown[i]}
+               for i in range(len(bills))]
+    for line, position, total in zip(priced_lines, bill_index, net.tolist()):
+        line["total"] = total
+        results[position]["items"].append(line)
+    return results
+
+
+def mismatches(client: Dict[str, Any], priced: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Client amounts (line price and total, bill subTotal and total) that differ
+    from the priced bill by more than ``TOLERANCE``."""
+    found = []
+    for index, (line, server) in enumerate(zip(client["items"], priced["items"])):
+        for field in ("price", "total"):
+            sent = line.get(field)
+            if sent is not None and abs(float(sent) - server[field]) > TOLERANCE:
+                found.append({"line": index, "code": server.get("code"), "field": field,
+                              "client": sent, "server": server[field]})
+    for field in ("subTotal", "total"):
+        sent = client.get(field)
+        if sent is not None and abs(float(sent) - priced[field]) > TOLERANCE:
+            found.append({"field": field, "client": sent, "server": priced[field]})
+    return found
@@ -0,0 +1,261 @@
+"""Streaming CSV and PDF exports of billing (``/api/report/export``).
+
+Billing rows arrive a page at a time (``range_fetch.iter_billing_range``) and
+each page is turned into output and sent before the next one is read, so
+memory stays flat whatever the size of the range. Rows are one per bill
+(``detail=bills``) or one per bill line (``detail=items``).
+
+fpdf keeps a whole document in memory until ``output()``. ``StreamingPDF``
+writes each page's objects out as soon as the page is finished instead, and
+only the page offsets are kept for the cross-reference table at the end.
+"""
+import asyncio
+import csv
+import io
+import json
+import zlib
+from typing import Any, AsyncIterator, Dict, Iterable, List, Tuple
+
+from fpdf import FPDF
+
+import rollups
+
+# Billing columns an export reads
+BILLING_COLUMNS = "id,customer_id,vehicle_no,payment_method,sub_total,total,payment_date,items"
+
+# (field, heading, PDF column width in mm, numeric)
+COLUMNS: Dict[str, List[Tuple[str, str, float, bool]]] = {
+    "bills": [
+        ("id", "Bill", 16, False),
+        ("payment_date", "Date", 36, False),
+        ("customer_id", "Customer", 18, False),
+        ("vehicle_no", "Vehicle", 28, False),
+        ("payment_method", "Payment", 24, False),
+        ("sub_total", "Sub total", 28, True),
+        ("product_sales", "Products", 28, True),
+        ("service_sales", "Services", 28, True),
+        ("total", "Total", 28, True),
+    ],
+    "items": [
+        ("billing_id", "Bill", 16, False),
+        ("payment_date", "Date", 36, False),
+        ("type", "Type", 18, False),
+        ("code", "Code", 24, False),
+        ("name", "Name", 72, False),
+        ("price", "Price", 24, True),
+        ("quantity", "Qty", 16, True),
+        ("discount", "Discount", 22, True),
+        ("total", "Total", 26, True),
+    ],
+}
+
+
+def bill_items(bill: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # items may come back as JSON text (a json rather than jsonb column)
+    items = bill.get("items") or []
+    if isinstance(items, str):
+        items = json.loads(items)
+    return items
+
+
+def bill_rows(bills: Iterable[Dict[str, Any]]) -> Iterable[Dict[str, Any]]:
+    for bill in bills:
+        product_sales, service_sales = rollups.sales_split(bill_items(bill))
+        yield {**bill, "product_sales": product_sales, "service_sales": service_sales}
+
+
+def item_rows(bills: Iterable[Dict[str, Any]]) -> Iterable[Dict[str, Any]]:
+    for bill in bills:
+        for item in bill_items(bill):
+            yield {**item, "billing_id": bill.get("id"), "payment_date": bill.get("payment_date")}
+
+
+def export_rows(bills: Iterable[Dict[str, Any]], detail: str) -> Iterable[Dict[str, Any]]:
+    return item_rows(bills) if detail == "items" else bill_rows(bills)
+
+
+async def export_csv(pages: AsyncIterator[List[Dict[str, Any]]], detail: str) -> AsyncIterator[str]:
+    """CSV text, the header first, then one chunk per billing page."""
+    fields = [field for field, _, _, _ in COLUMNS[detail]]
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    async for page in pages:
+        writer.writerows(export_rows(page, detail))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _latin1(value: Any) -> str:
+    # The PDF core fonts only cover Latin-1
+    return str(value).encode("latin-1", "replace").decode("latin-1")
+
+
+class StreamingPDF(FPDF):
+    """FPDF that hands out finished pages with ``drain()`` instead of
+    building the whole file. Page objects get the numbers fpdf itself would
+    give them (3, 5, 7, ...), as fonts are only written at the end."""
+
+    def __init__(self, title: str, columns: List[Tuple[str, str, float, bool]], **kwargs):
+        super().__init__(**kwargs)
+        self.title = title
+        self.columns = columns
+        self.set_auto_page_break(True, margin=12)
+        self._written = 0
+        self._started = False
+
+    def _offset(self) -> int:
+        return self._written + len(self.buffer)
+
+    def _newobj(self):
+        self.n += 1
+        self.offsets[self.n] = self._offset()
+        self._out(str(self.n) + ' 0 obj')
+
+    def _putheader(self):
+        if not self._started:
+            self._started = True
+            super()._putheader()
+
+    def _endpage(self):
+        super()._endpage()
+        # Write the finished page (page object and content stream) and free it
+        self._putheader()
+        content = self.pages.pop(self.page).encode("latin-1")
+        if self.compress:
+            content = zlib.compress(content)
+        self._newobj()
+        self._out('<</Type /Page')
+        self._out('/Parent 1 0 R')
+        self._out('/Resources 2 0 R')
+        self._out('/Contents ' + str(self.n + 1) + ' 0 R>>')
+        self._out('endobj')
+        self._newobj()
+        self._out('<<' + ('/Filter /FlateDecode ' if self.compress else '') + '/Length ' + str(len(content)) + '>>')
+        self._putstream(content)
+        self._out('endobj')
+
+    def _putpages(self):
+        # Pages are already written; only the page tree is left
+        w_pt, h_pt = (self.fw_pt, self.fh_pt) if self.def_orientation == 'P' else (self.fh_pt, self.fw_pt)
+        self.offsets[1] = self._offset()
+        self._out('1 0 obj')
+        self._out('<</Type /Pages')
+        self._out('/Kids [' + ''.join('%d 0 R ' % (3 + 2 * i) for i in range(self.page)) + ']')
+        self._out('/Count ' + str(self.page))
+        self._out('/MediaBox [0 0 %.2f %.2f]' % (w_pt, h_pt))
+        self._out('>>')
+        self._out('endobj')
+
+    def _putresources(self):
+        self._putfonts()
+        self._putimages()
+        self.offsets[2] = self._offset()
+        self._out('2 0 obj')
+        self._out('<<')
+        self._putresourcedict()
+        self._out('>>')
+        self._out('endobj')
+
+    def _enddoc(self):
+        # fpdf's _enddoc with offsets counted from the start of the stream
+        self._putheader()
+        self._putpages()
+        self._putresources()
+        self._newobj()
+        self._out('<<')
+        self._putinfo()
+        self._out('>>')
+        self._out('endobj')
+        self._newobj()
+        self._out('<<')
+        self._putcatalog()
+        self._out('>>')
+        self._out('endobj')
+        xref = self._offset()
+        self._out('xref')
+        self._out('0 ' + str(self.n + 1))
+        self._out('0000000000 65535 f ')
+        for i in range(1, self.n + 1):
+            self._out('%010d 00000 n ' % self.offsets[i])
+        self._out('trailer')
+        self._out('<<')
+        self._puttrailer()
+        self._out('>>')
+        self._out('startxref')
+        self._out(xref)
+        self._out('%%EOF')
+        self.state = 3
+
+    def drain(self) -> bytes:
+        """PDF bytes written since the last drain."""
+        chunk = self.buffer.encode("latin-1")
+        self._written += len(chunk)
+        self.buffer = ''
+        return chunk
+
+    # --- layout ---
+    def header(self):
+        self.set_font('Helvetica', 'B', 11)
+        self.cell(0, 7, _latin1(self.title), ln=1)
+        self.set_font('Helvetica', 'B', 8)
+        self.set_fill_color(230, 230, 230)
+        for _, heading, width, numeric in self.columns:
+            self.cell(width, 6, heading, border=1, align='R' if numeric else 'L', fill=True)
+        self.ln()
+        self.set_font('Helvetica', '', 8)
+
+    def footer(self):
+        self.set_y(-10)
+        self.set_font('Helvetica', '', 7)
+        self.cell(0, 5, 'Page %d' % self.page_no(), align='C')
+
+    def _fit(self, text: str, width: float) -> str:
+        if self.get_string_width(text) <= width - 2:
+            return text
+        while text and self.get_string_width(text + '...') > width - 2:
+            text = text[:-1]
+        return text + '...'
+
+    def write_rows(self, rows: Iterable[Dict[str, Any]]) -> None:
+        for row in rows:
+            for field, _, width, numeric in self.columns:
+                value = row.get(field)
+                if value is None:
+                    text = ''
+                elif numeric:
+                    text = '%.2f' % float(value) if isinstance(value, (int, float)) else _latin1(value)
+                elif field == "payment_date":
+                    # Minutes are enough on paper
+                    text = _latin1(value)[:16].replace('T', ' ')
+                else:
+                    text = _latin1(value)
+                self.cell(width, 5, self._fit(text, width), border=1, align='R' if numeric else 'L')
+            self.ln()
+
+    def write_totals(self, bills: int, total: float) -> None:
+        self.ln(2)
+        self.set_font('Helvetica', 'B', 9)
+        self.cell(0, 6, 'Bills: %d    Total sales: %.2f' % (bills, total), ln=1)
+
+
+async def export_pdf(pages: AsyncIterator[List[Dict[str, Any]]], detail: str, title: str) -> AsyncIterator[bytes]:
+    """PDF bytes, sent as pages fill up. Rendering runs in a worker thread."""
+    pdf = StreamingPDF(title, COLUMNS[detail], orientation='L', unit='mm', format='A4')
+    pdf.set_title(title)
+    pdf.add_page()
+    bills = 0
+    total = 0.0
+    async for page in pages:
+        bills += len(page)
+        total += sum(bill.get("total") or 0 for bill in page)
+        await asyncio.to_thread(pdf.write_rows, list(export_rows(page, detail)))
+        chunk = pdf.drain()
+        if chunk:
+            yield chunk
+    pdf.write_totals(bills, total)
+    pdf.close()
+    yield pdf.drain()
@@ -0,0 +1,544 @@
+import asyncio
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from postgrest import AsyncPostgrestClient, APIError
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+
+
+class PooledPostgrestClient(AsyncPostgrestClient):
+    """AsyncPostgrestClient with an explicit keep-alive HTTP/2 connection pool."""
+
+    def __init__(
+        self,
+        base_url: str,
+        *,
+        headers: Dict[str, str],
+        timeout: float,
+        limits: httpx.Limits,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        event_hooks: Optional[Dict[str, List[Callable]]] = None,
+    ) -> None:
+        # create_session() is called from the base constructor, so these must be set first
+        self._limits = limits
+        self._transport = transport
+        self._event_hooks = event_hooks
+        super().__init__(base_url, headers=headers, timeout=timeout)
+
+    def create_session(self, base_url, headers, timeout, verify=True, proxy=None):
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            verify=verify,
+            proxy=proxy,
+            follow_redirects=True,
+            http2=self._transport is None,
+            limits=self._limits,
+            transport=self._transport,
+            event_hooks=self._event_hooks,
+        )
+
+
+class Repository(ABC):
+    """Storage interface behind the product, service, customer and billing endpoints.
+
+    Implementations: ``SupabaseRepository`` (hosted PostgREST, the default) and
+    ``sql_repository.SqlRepository`` (SQLAlchemy on SQLite or a local Postgres),
+    selected with ``STORAGE_BACKEND``. ``observer(table, operation, seconds)``
+    is called after every backend call, e.g. ``("billing", "insert", 0.04)``.
+    """
+
+    async def aclose(self) -> None:
+        pass
+
+    async def warmup(self) -> None:
+        """Open a connection ahead of the first request (called at startup)."""
+
+    # --- Products ---
+    @abstractmethod
+    async def list_products(self) -> List[Dict[str, Any]]:
+        """Every product, however many there are."""
+
+    @abstractmethod
+    async def insert_product(self, data: Dict[str, Any]) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def update_product(self, code: str, data: Dict[str, Any]) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def upsert_products(self, rows: List[Dict[str, Any]],
+                        insert_only: Tuple[str, ...] = ()) -> List[Dict[str, Any]]:
+        """Insert or update ``rows`` (all with the same keys) by ``code``.
+
+        Columns in ``insert_only`` are written for new codes only; rows that
+        already exist keep their stored value.
+        """
+
+    @abstractmethod
+    async def decrement_product_stock(self, quantities: Dict[Any, int]) -> List[Dict[str, Any]]:
+        """Atomically subtract ``quantities`` ({product_id: amount}) from stock, floored at 0.
+
+        Returns ``id``, ``previous_quantity`` and ``quantity`` for every product that exists.
+        """
+
+    @abstractmethod
+    async def count_products(self) -> int: ...
+
+    # --- Services ---
+    @abstractmethod
+    async def list_services(self) -> List[Dict[str, Any]]:
+        """Every service, however many there are."""
+
+    @abstractmethod
+    async def insert_service(self, data: Dict[str, Any]) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def update_service(self, code: str, data: Dict[str, Any]) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def upsert_services(self, rows: List[Dict[str, Any]],
+                        insert_only: Tuple[str, ...] = ()) -> List[Dict[str, Any]]:
+        """Insert or update ``rows`` (all with the same keys) by ``code``.
+
+        Columns in ``insert_only`` are written for new codes only; rows that
+        already exist keep their stored value.
+        """
+
+    @abstractmethod
+    async def count_services(self) -> int: ...
+
+    # --- Customers ---
+    @abstractmethod
+    async def insert_customer(self, data: Dict[str, Any]) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def insert_customers(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert ``rows`` in one statement; returns the inserted rows in the same order."""
+
+    @abstractmethod
+    async def upsert_customers(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert ``rows`` (distinct ``customer_key``s) or return the existing row per key.
+
+        A non-empty name or company replaces the stored one; empty ones keep it.
+        """
+
+    @abstractmethod
+    async def merge_customers(self, merges: List[Dict[str, Any]]) -> int:
+        """Fold duplicate customers into one row each (see ``customer_dedup``).
+
+        Each merge names the row to keep (``id``), its ``duplicates`` and the
+        values to store on the kept row (``customer_key``, ``name``, ``company``,
+        ``payment``, ``payment_date``). Bills of a duplicate are re-pointed at the
+        kept row before it is deleted. If another row already holds the key, that
+        row is kept instead. Returns the number of rows deleted.
+        """
+
+    @abstractmethod
+    async def list_customers(self) -> List[Dict[str, Any]]:
+        """Customers whose name has actual content (not NULL, empty or whitespace)."""
+
+    @abstractmethod
+    async def list_customers_page(self, limit: int, after: Optional[int] = None,
+                                  named: bool = True) -> List[Dict[str, Any]]:
+        """Keyset page of customers ordered by id, starting after ``after``.
+
+        Only customers with a name unless ``named`` is False.
+        """
+
+    async def iter_customers(self, after: Optional[int] = None, page_size: int = 1000,
+                             named: bool = True) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield customers page by page, so callers never hold the whole table."""
+        while True:
+            page = await self.list_customers_page(page_size, after, named)
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            after = page[-1]["id"]
+
+    # --- Billing ---
+    @abstractmethod
+    async def insert_billing(self, data: Dict[str, Any]) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def insert_billings(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert ``rows`` in one statement; returns the inserted rows in the same order.
+
+        Each inserted bill's total is added to its customer's ``payment`` and its
+        date kept as ``payment_date`` if later (the ``billing_add_to_customer``
+        trigger in sql/customers.sql), here and in ``upsert_billings``.
+        """
+
+    @abstractmethod
+    async def upsert_billings(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert ``rows`` (distinct ``client_key``s) or return the stored row per key.
+
+        Stored rows are left unchanged, so a retried insert never writes a
+        bill twice. Returns one row per input row, in the same order.
+        """
+
+    @abstractmethod
+    async def billing_page(self, start: str, end: str, columns: str = "*", offset: int = 0,
+                           limit: int = 1000, count: bool = False) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Rows ``offset``..``offset + limit`` of [start, end) in (payment_date, id) order.
+
+        ``columns`` is a comma-separated column list or ``*``. With ``count`` the
+        exact number of matching rows is returned alongside.
+        """
+
+    @abstractmethod
+    async def count_billing(self, start: str, end: str) -> int: ...
+
+    # --- Daily sales rollup ---
+    @abstractmethod
+    async def record_daily_sale(self, day: str, payment_method: str, total: float,
+                                product_sales: float, service_sales: float, bill_count: int = 1) -> None: ...
+
+    @abstractmethod
+    async def list_daily_sales(self, start: str, end: str) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def rebuild_daily_sales(self, start: str, end: str) -> int:
+        """Recompute the rollup for [start, end) from billing; returns rows written."""
+
+
+def postgrest_call_name(method: str, path: str, prefer: str = "") -> Tuple[str, str]:
+    """Map a PostgREST request to (table, operation), e.g. ('billing', 'insert')."""
+    resource = path.rsplit("/rest/v1/", 1)[-1].strip("/")
+    if resource.startswith("rpc/"):
+        return "rpc", resource[4:]
+    operation = {
+        "GET": "select",
+        "HEAD": "count",
+        "POST": "upsert" if "resolution=" in prefer else "insert",
+        "PATCH": "update",
+        "DELETE": "delete",
+    }.get(method, method.lower())
+    return resource, operation
+
+
+class SupabaseRepository(Repository):
+    """Async data access for every table the API touches, over PostgREST.
+
+    One instance is shared by all requests, so PostgREST calls reuse the same
+    pooled connections and never block the event loop.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        *,
+        max_connections: int = 50,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 60.0,
+        timeout: float = 30.0,
+        page_size: int = 1000,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        observer: Optional[Callable[[str, str, float], None]] = None,
+    ) -> None:
+        headers = {
+            **DEFAULT_POSTGREST_CLIENT_HEADERS,
+            "apiKey": key,
+            "Authorization": f"Bearer {key}",
+        }
+        self._client_options = dict(
+            base_url=f"{url.rstrip('/')}/rest/v1",
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            transport=transport,
+            event_hooks=self._timing_hooks(observer) if observer else None,
+        )
+        self._client: Optional[PooledPostgrestClient] = None
+        self._client_lock = threading.Lock()
+        # Rows per page of a full-table read; at most PostgREST's max-rows (1000 on Supabase)
+        self.page_size = page_size
+
+    @property
+    def client(self) -> PooledPostgrestClient:
+        # Built on first use: creating the HTTP transport imports httpcore and
+        # loads the CA bundle, which would otherwise add to every cold start
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = PooledPostgrestClient(**self._client_options)
+        return self._client
+
+    @staticmethod
+    def _timing_hooks(observer) -> Dict[str, List[Callable]]:
+        async def on_request(request: httpx.Request) -> None:
+            request.extensions["started"] = time.perf_counter()
+
+        async def on_response(response: httpx.Response) -> None:
+            request = response.request
+            started = request.extensions.get("started")
+            if started is not None:
+                table, operation = postgrest_call_name(
+                    request.method, request.url.path, request.headers.get("prefer", "")
+                )
+                observer(table, operation, time.perf_counter() - started)
+
+        return {"request": [on_request], "response": [on_response]}
+
+    def table(self, name: str):
+        return self.client.table(name)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+
+    async def warmup(self) -> None:
+        # Build the client off the event loop, then open a pooled connection
+        # (TCP, TLS and HTTP/2 setup) with a one-row read
+        await asyncio.to_thread(lambda: self.client)
+        await self.table('products').select('id').limit(1).execute()
+
+    async def _list_all(self, name: str) -> List[Dict[str, Any]]:
+        # Keyset pages by id: one unpaged select would be cut off at PostgREST's max-rows
+        rows: List[Dict[str, Any]] = []
+        after = None
+        while True:
+            query = self.table(name).select("*")
+            if after is not None:
+                query = query.gt('id', after)
+            response = await query.order('id').limit(self.page_size).execute()
+            page = response.data or []
+            rows.extend(page)
+            if len(page) < self.page_size:
+                return rows
+            after = page[-1]["id"]
+
+    # --- Products ---
+    async def _upsert_by_code(self, name: str, rows: List[Dict[str, Any]],
+                              insert_only: Tuple[str, ...]) -> List[Dict[str, Any]]:
+        if not rows:
+            return []
+        kept = [column for column in insert_only if column in rows[0]]
+        if not kept:
+            response = await self.table(name).upsert(rows, on_conflict='code').execute()
+            return response.data or []
+        # PostgREST updates every posted column on conflict, so look up which codes
+        # exist and post those rows without the insert-only columns
+        response = await self.table(name).select('code').in_('code', [row['code'] for row in rows]).execute()
+        existing = {row['code'] for row in response.data or []}
+        new_rows = [row for row in rows if row['code'] not in existing]
+        updates = [{key: value for key, value in row.items() if key not in kept}
+                   for row in rows if row['code'] in existing]
+        written: List[Dict[str, Any]] = []
+        for group in (updates, new_rows):
+            if group:
+                response = await self.table(name).upsert(group, on_conflict='code').execute()
+                written.extend(response.data or [])
+        return written
+
+    async def list_products(self) -> List[Dict[str, Any]]:
+        return await self._list_all('products')
+
+    async def insert_product(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        response = await self.table('products').insert(data).execute()
+        return response.data or []
+
+    async def update_product(self, code: str, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        response = await self.table('products').update(data).eq('code', code).execute()
+        return response.data or []
+
+    async def upsert_products(self, rows: List[Dict[str, Any]],
+                        insert_only: Tuple[str, ...] = ()) -> List[Dict[str, Any]]:
+        return await self._upsert_by_code('products', rows, insert_only)
+
+    async def decrement_product_stock(self, quantities: Dict[Any, int]) -> List[Dict[str, Any]]:
+        """Subtract ``quantities`` ({product_id: amount}) from stock in one round trip.
+
+        Uses the ``decrement_product_stock`` RPC (sql/decrement_product_stock.sql)
+        so the whole bill is applied atomically. Returns ``id``,
+        ``previous_quantity`` and ``quantity`` for every product that exists.
+        """
+        if not quantities:
+            return []
+        items = [{"id": product_id, "quantity": amount} for product_id, amount in quantities.items()]
+        try:
+            response = await self.client.rpc('decrement_product_stock', {"items": items}).execute()
+            return response.data or []
+        except APIError as e:
+            # PGRST202: function not installed yet - fall back to the batched path
+            if e.code != 'PGRST202':
+                raise
+        return await self._decrement_product_stock_batched(quantities)
+
+    async def _decrement_product_stock_batched(self, quantities: Dict[Any, int]) -> List[Dict[str, Any]]:
+        # One in_ read, then concurrent compare-and-set updates so a concurrent
+        # sale of the same SKU is retried instead of overwritten
+        pending = dict(quantities)
+        results = []
+        for _ in range(5):
+            response = await self.table('products')\
+                .select('id, quantity')\
+                .in_('id', list(pending))\
+                .execute()
+            current = {row["id"]: row["quantity"] for row in response.data or []}
+
+            async def apply(product_id, previous):
+                new_quantity = max(0, previous - pending[product_id])
+                updated = await self.table('products')\
+                    .update({"quantity": new_quantity})\
+                    .eq('id', product_id)\
+                    .eq('quantity', previous)\
+                    .execute()
+                if updated.data:
+                    return {"id": product_id, "previous_quantity": previous, "quantity": new_quantity}
+                return None
+
+            outcomes = await asyncio.gather(*(apply(pid, qty) for pid, qty in current.items()))
+            for row in outcomes:
+                if row:
+                    results.append(row)
+                    del pending[row["id"]]
+            # Ids that do not exist are dropped; only lost races are retried
+            pending = {pid: amount for pid, amount in pending.items() if pid in current}
+            if not pending:
+                break
+        return results
+
+    async def count_products(self) -> int:
+        response = await self.table('products').select('id', count='exact', head=True).execute()
+        return response.count or 0
+
+    # --- Services ---
+    async def list_services(self) -> List[Dict[str, Any]]:
+        return await self._list_all('services')
+
+    async def insert_service(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        response = await self.table('services').insert(data).execute()
+        return response.data or []
+
+    async def update_service(self, code: str, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        response = await self.table('services').update(data).eq('code', code).execute()
+        return response.data or []
+
+    async def upsert_services(self, rows: List[Dict[str, Any]],
+                        insert_only: Tuple[str, ...] = ()) -> List[Dict[str, Any]]:
+        return await self._upsert_by_code('services', rows, insert_only)
+
+    async def count_services(self) -> int:
+        response = await self.table('services').select('id', count='exact', head=True).execute()
+        return response.count or 0
+
+    # --- Customers ---
+    async def insert_customer(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        response = await self.table('customer').insert(data).execute()
+        return response.data or []
+
+    async def insert_customers(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if not rows:
+            return []
+        response = await self.table('customer').insert(rows).execute()
+        return response.data or []
+
+    async def upsert_customers(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # RPC (sql/customers.sql) rather than .upsert(), which would overwrite a
+        # stored name with an empty one
+        if not rows:
+            return []
+        response = await self.client.rpc('upsert_customers', {"rows": rows}).execute()
+        return response.data or []
+
+    async def merge_customers(self, merges: List[Dict[str, Any]]) -> int:
+        if not merges:
+            return 0
+        response = await self.client.rpc('merge_customers', {"merges": merges}).execute()
+        return response.data or 0
+
+    def _named_customers(self, columns: str = "*"):
+        # Customers whose name has actual content (not NULL, empty or whitespace)
+        return self.table('customer').select(columns).not_.filter('name', 'match', r'^\s*$')
+
+    async def list_customers(self) -> List[Dict[str, Any]]:
+        response = await self._named_customers().execute()
+        return response.data or []
+
+    async def list_customers_page(self, limit: int, after: Optional[int] = None,
+                                  named: bool = True) -> List[Dict[str, Any]]:
+        query = self._named_customers() if named else self.table('customer').select("*")
+        if after is not None:
+            query = query.gt('id', after)
+        response = await query.order('id').limit(limit).execute()
+        return response.data or []
+
+    # --- Billing ---
+    async def insert_billing(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        response = await self.table('billing').insert(data).execute()
+        return response.data or []
+
+    async def insert_billings(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if not rows:
+            return []
+        response = await self.table('billing').insert(rows).execute()
+        return response.data or []
+
+    async def upsert_billings(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # on conflict do nothing (sql/billing_client_key.sql); only new rows come back
+        if not rows:
+            return []
+        response = await self.table('billing')\
+            .upsert(rows, on_conflict='client_key', ignore_duplicates=True)\
+            .execute()
+        stored = {row["client_key"]: row for row in response.data or []}
+        missing = [row["client_key"] for row in rows if row["client_key"] not in stored]
+        if missing:
+            response = await self.table('billing').select("*").in_('client_key', missing).execute()
+            stored.update((row["client_key"], row) for row in response.data or [])
+        return [stored[row["client_key"]] for row in rows if row["client_key"] in stored]
+
+    async def billing_page(self, start: str, end: str, columns: str = "*", offset: int = 0,
+                           limit: int = 1000, count: bool = False) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        response = await self.table('billing')\
+            .select(columns, count='exact' if count else None)\
+            .gte('payment_date', start)\
+            .lt('payment_date', end)\
+            .order('payment_date')\
+            .order('id')\
+            .range(offset, offset + limit - 1)\
+            .execute()
+        return response.data or [], response.count
+
+    async def count_billing(self, start: str, end: str) -> int:
+        response = await self.table('billing')\
+            .select('id', count='exact', head=True)\
+            .gte('payment_date', start)\
+            .lt('payment_date', end)\
+            .execute()
+        return response.count or 0
+
+    # --- Daily sales rollup (sql/daily_sales.sql) ---
+    async def record_daily_sale(self, day: str, payment_method: str, total: float,
+                                product_sales: float, service_sales: float, bill_count: int = 1) -> None:
+        await self.client.rpc('record_daily_sale', {
+            "sale_day": day,
+            "sale_payment_method": payment_method,
+            "sale_total": total,
+            "sale_product_sales": product_sales,
+            "sale_service_sales": service_sales,
+            "sale_bill_count": bill_count,
+        }).execute()
+
+    async def list_daily_sales(self, start: str, end: str) -> List[Dict[str, Any]]:
+        response = await self.table('daily_sales')\
+            .select("*")\
+            .gte('day', start)\
+            .lt('day', end)\
+            .order('day')\
+            .execute()
+        return response.data or []
+
+    async def rebuild_daily_sales(self, start: str, end: str) -> int:
+        response = await self.client.rpc('rebuild_daily_sales', {"start_day": start, "end_day": end}).execute()
+        return response.data or 0
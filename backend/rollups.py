@@ -0,0 +1,122 @@
+"""Daily sales rollup (``daily_sales`` table, see sql/daily_sales.sql).
+
+submit_bill adds every bill to its day with ``record_bills``; report summaries
+read one row per day and payment method instead of scanning billing.
+
+Backfill or repair a range with:
+
+    python rollups.py rebuild --start 2025-01-01 [--end 2025-05-01]
+"""
+import argparse
+import asyncio
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Tuple
+
+
+def sales_split(items: Iterable[Dict[str, Any]]) -> Tuple[float, float]:
+    """Product and service sales of one bill's items."""
+    product_sales = 0
+    service_sales = 0
+    for item in items or []:
+        if item.get('type') == 'product':
+            product_sales += item.get('total', 0)
+        elif item.get('type') == 'service':
+            service_sales += item.get('total', 0)
+    return product_sales, service_sales
+
+
+def sale_day(payment_date: Any) -> str:
+    """The UTC day (YYYY-MM-DD) of a ``payment_date`` datetime or ISO string.
+
+    Days are UTC as in the sales facts and in ``rebuild_daily_sales``, where
+    the timestamptz column is cast to a date, so a bill taken at 01:00+05:30
+    counts for the day before.
+    """
+    if isinstance(payment_date, str):
+        payment_date = datetime.fromisoformat(payment_date)
+    if payment_date.tzinfo is not None:
+        payment_date = payment_date.astimezone(timezone.utc)
+    return payment_date.date().isoformat()
+
+
+async def record_bills(repo, bills: Iterable[Tuple[datetime, str, float, List[Dict[str, Any]]]]) -> None:
+    """Add many (payment_date, payment_method, total, items) bills with one update per day and method."""
+    groups: Dict[Tuple[str, str], List[float]] = {}
+    for payment_date, payment_method, total, items in bills:
+        product_sales, service_sales = sales_split(items)
+        group = groups.setdefault((sale_day(payment_date), payment_method or ''), [0, 0, 0, 0])
+        group[0] += 1
+        group[1] += total
+        group[2] += product_sales
+        group[3] += service_sales
+    await asyncio.gather(*(
+        repo.record_daily_sale(day, method, total, product_sales, service_sales, bill_count)
+        for (day, method), (bill_count, total, product_sales, service_sales) in groups.items()
+    ))
+
+
+def summarize(rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fold rollup rows into report totals with per-day and per-payment-method splits."""
+    summary = {"totalSales": 0, "totalBills": 0, "productSales": 0, "serviceSales": 0}
+    by_method: Dict[str, Dict[str, Any]] = {}
+    by_day: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        method = by_method.setdefault(row.get('payment_method') or '', {"totalSales": 0, "totalBills": 0})
+        day = by_day.setdefault(row['day'], {
+            "day": row['day'], "totalSales": 0, "totalBills": 0, "productSales": 0, "serviceSales": 0
+        })
+        for target in (summary, day):
+            target["totalSales"] += row.get('total') or 0
+            target["totalBills"] += row.get('bill_count') or 0
+            target["productSales"] += row.get('product_sales') or 0
+            target["serviceSales"] += row.get('service_sales') or 0
+        method["totalSales"] += row.get('total') or 0
+        method["totalBills"] += row.get('bill_count') or 0
+
+    summary["byPaymentMethod"] = by_method
+    summary["days"] = sorted(by_day.values(), key=lambda d: d["day"])
+    return summary
+
+
+async def rebuild(repo, start: date, end: date, chunk_days: int = 31) -> int:
+    """Recompute the rollup for [start, end) one chunk at a time."""
+    written = 0
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days), end)
+        written += await repo.rebuild_daily_sales(chunk_start.isoformat(), chunk_end.isoformat())
+        print(f"Rebuilt {chunk_start} .. {chunk_end - timedelta(days=1)}")
+        chunk_start = chunk_end
+    return written
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Maintain the daily_sales rollup")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = commands.add_parser("rebuild", help="Backfill the rollup from billing")
+    rebuild_parser.add_argument("--start", required=True, help="First day, YYYY-MM-DD")
+    rebuild_parser.add_argument("--end", help="Last day (inclusive), YYYY-MM-DD; defaults to today")
+    args = parser.parse_args(argv)
+
+    start = datetime.strptime(args.start, "%Y-%m-%d").date()
+    end = datetime.strptime(args.end, "%Y-%m-%d").date() if args.end else datetime.utcnow().date()
+
+    async def run():
+        if os.environ.get("STORAGE_BACKEND", "supabase").lower() == "sql":
+            from sql_repository import SqlRepository
+            repo = SqlRepository(os.environ.get("DATABASE_URL", "sqlite:///./autospa.db"))
+        else:
+            from repository import SupabaseRepository
+            repo = SupabaseRepository(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+        try:
+            written = await rebuild(repo, start, end + timedelta(days=1))
+        finally:
+            await repo.aclose()
+        print(f"Wrote {written} rollup rows")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+"""Columnar line-item store behind ``/api/analytics``.
+
+The ``items`` JSON of every bill is flattened into one row per line and kept
+as NumPy arrays per day: bill, hour, kind (product or service), item id,
+quantity and total, plus one row per bill (hour, total, lines, units). Top
+items, hourly histograms and basket statistics are vectorized group-bys
+(``bincount``/``unique``) over the days a request covers.
+
+Days are UTC, like the daily rollup. A closed day (before today) is built
+once from billing and cached: the ``cache_days`` most recently used in
+memory and, when ``directory`` is set (``SALES_FACTS_DIR``), as one ``.npz``
+file per day, so a restart does not fetch it again. Today is rebuilt from
+billing at most every ``today_ttl`` seconds; in between apply_bills appends
+the bills this instance writes. A bill dated on a closed day (e.g. a
+journaled bill synced after midnight) evicts that day, so it is rebuilt.
+
+NumPy is imported on first use, so it does not add to cold starts.
+"""
+import asyncio
+import json
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from cachetools import LRUCache
+
+from range_fetch import fetch_billing_range
+
+# Billing columns the store is built from
+BILLING_COLUMNS = "id,payment_date,total,items"
+
+KINDS = ("product", "service")
+PRODUCT, SERVICE = 0, 1
+
+# Bumped when the arrays change, so stale day files are rebuilt
+FORMAT_VERSION = 1
+
+# Line columns, bill columns, and the (kind, item) -> code/name labels
+LINE_COLUMNS = ("bill", "hour", "kind", "item", "quantity", "total")
+BILL_COLUMNS = ("bill_hour", "bill_total", "bill_lines", "bill_units")
+LABEL_COLUMNS = ("label_kind", "label_item", "label_code", "label_name")
+
+
+def _np():
+    import numpy
+    return numpy
+
+
+def payment_time(value: Any) -> Optional[datetime]:
+    """A billing ``payment_date`` as a naive UTC datetime."""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _number(value: Any, default: float = 0) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _item_id(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+
+class DayFacts:
+    """Line and bill arrays for one or more days."""
+
+    def __init__(self, arrays: Dict[str, Any]):
+        self.arrays = arrays
+
+    def __getitem__(self, column: str):
+        return self.arrays[column]
+
+    @property
+    def bills(self) -> int:
+        return len(self.arrays["bill_total"])
+
+    @classmethod
+    def build(cls, bills: Iterable[Dict[str, Any]]) -> "DayFacts":
+        """Flatten billing rows (``BILLING_COLUMNS``) into arrays."""
+        np = _np()
+        lines: Dict[str, List[Any]] = {column: [] for column in LINE_COLUMNS}
+        per_bill: Dict[str, List[Any]] = {column: [] for column in BILL_COLUMNS}
+        labels: Dict[Tuple[int, int], Tuple[str, str]] = {}
+        for bill in bills:
+            when = payment_time(bill.get("payment_date"))
+            hour = when.hour if when else 0
+            items = bill.get("items") or []
+            if isinstance(items, str):
+                items = json.loads(items)
+            position = len(per_bill["bill_total"])
+            count = units = 0
+            for item in items:
+                kind = KINDS.index(item["type"]) if item.get("type") in KINDS else None
+                if kind is None:
+                    continue
+                item_id = _item_id(item.get("id"))
+                quantity = _number(item.get("quantity"), 1)
+                lines["bill"].append(position)
+                lines["hour"].append(hour)
+                lines["kind"].append(kind)
+                lines["item"].append(item_id)
+                lines["quantity"].append(quantity)
+                lines["total"].append(_number(item.get("total")))
+                labels[(kind, item_id)] = (str(item.get("code") or ""), str(item.get("name") or ""))
+                count += 1
+                units += quantity
+            per_bill["bill_hour"].append(hour)
+            per_bill["bill_total"].append(_number(bill.get("total")))
+            per_bill["bill_lines"].append(count)
+            per_bill["bill_units"].append(units)
+
+        return cls({
+            "bill": np.array(lines["bill"], dtype=np.int64),
+            "hour": np.array(lines["hour"], dtype=np.int8),
+            "kind": np.array(lines["kind"], dtype=np.int8),
+            "item": np.array(lines["item"], dtype=np.int64),
+            "quantity": np.array(lines["quantity"], dtype=np.float64),
+            "total": np.array(lines["total"], dtype=np.float64),
+            "bill_hour": np.array(per_bill["bill_hour"], dtype=np.int8),
+            "bill_total": np.array(per_bill["bill_total"], dtype=np.float64),
+            "bill_lines": np.array(per_bill["bill_lines"], dtype=np.int32),
+            "bill_units": np.array(per_bill["bill_units"], dtype=np.float64),
+            "label_kind": np.array([kind for kind, _ in labels], dtype=np.int8),
+            "label_item": np.array([item for _, item in labels], dtype=np.int64),
+            "label_code": np.array([code for code, _ in labels.values()], dtype=str),
+            "label_name": np.array([name for _, name in labels.values()], dtype=str),
+        })
+
+    @classmethod
+    def concat(cls, days: List["DayFacts"]) -> "DayFacts":
+        """One set of arrays for several days, oldest first."""
+        np = _np()
+        if len(days) == 1:
+            return days[0]
+        if not days:
+            return cls.build([])
+        offsets = np.cumsum([0] + [day.bills for day in days[:-1]])
+        arrays = {
+            column: np.concatenate([day[column] for day in days])
+            for column in LINE_COLUMNS + BILL_COLUMNS + LABEL_COLUMNS if column != "bill"
+        }
+        arrays["bill"] = np.concatenate([day["bill"] + offset for day, offset in zip(days, offsets)])
+        return cls(arrays)
+
+    def save(self, path: str) -> None:
+        np = _np()
+        partial = f"{path}.tmp"
+        with open(partial, "wb") as f:
+            np.savez(f, **self.arrays)
+        os.replace(partial, path)
+
+    @classmethod
+    def load(cls, path: str) -> "DayFacts":
+        np = _np()
+        with np.load(path, allow_pickle=False) as data:
+            return cls({column: data[column] for column in data.files})
+
+    # --- analytics ---
+    def labels(self) -> Dict[Tuple[int, int], Tuple[str, str]]:
+        # Later days come last, so the latest code/name wins
+        return {
+            (int(kind), int(item)): (str(code), str(name))
+            for kind, item, code, name in zip(*(self[column] for column in LABEL_COLUMNS))
+        }
+
+    def top(self, kind: int, by: str = "sales", limit: int = 10) -> List[Dict[str, Any]]:
+        """Best-selling items of one kind by ``sales`` or ``quantity``."""
+        np = _np()
+        mask = self["kind"] == kind
+        if not mask.any():
+            return []
+        items, inverse = np.unique(self["item"][mask], return_inverse=True)
+        sales = np.bincount(inverse, weights=self["total"][mask])
+        quantity = np.bincount(inverse, weights=self["quantity"][mask])
+        # Distinct bills per item: unique (item, bill) pairs
+        pairs = np.unique(inverse * max(self.bills, 1) + self["bill"][mask])
+        bills = np.bincount(pairs // max(self.bills, 1), minlength=len(items))
+        ranked = np.argsort(-(sales if by == "sales" else quantity), kind="stable")[:limit]
+        labels = self.labels()
+        return [
+            {
+                "id": int(items[i]),
+                "code": labels.get((kind, int(items[i])), ("", ""))[0],
+                "name": labels.get((kind, int(items[i])), ("", ""))[1],
+                "sales": round(float(sales[i]), 2),
+                "quantity": round(float(quantity[i]), 3),
+                "bills": int(bills[i]),
+            }
+            for i in ranked
+        ]
+
+    def hourly(self) -> List[Dict[str, Any]]:
+        """Bills, sales and product/service sales per hour of the day (UTC)."""
+        np = _np()
+        bill_hours = self["bill_hour"].astype(np.int64)
+        line_hours = self["hour"].astype(np.int64)
+        bills = np.bincount(bill_hours, minlength=24)
+        sales = np.bincount(bill_hours, weights=self["bill_total"], minlength=24)
+        by_kind = [
+            np.bincount(line_hours[self["kind"] == kind], weights=self["total"][self["kind"] == kind], minlength=24)
+            for kind in (PRODUCT, SERVICE)
+        ]
+        return [
+            {
+                "hour": hour,
+                "totalBills": int(bills[hour]),
+                "totalSales": round(float(sales[hour]), 2),
+                "productSales": round(float(by_kind[PRODUCT][hour]), 2),
+                "serviceSales": round(float(by_kind[SERVICE][hour]), 2),
+            }
+            for hour in range(24)
+        ]
+
+    def basket(self) -> Dict[str, Any]:
+        """Bill size statistics and how many bills mix products and services."""
+        np = _np()
+        count = self.bills
+        if not count:
+            return {"totalBills": 0, "totalSales": 0, "averageBill": 0, "medianBill": 0, "p90Bill": 0,
+                    "averageLines": 0, "averageUnits": 0, "productOnly": 0, "serviceOnly": 0, "mixed": 0}
+        totals = self["bill_total"]
+        has = [
+            np.bincount(self["bill"][self["kind"] == kind], minlength=count) > 0
+            for kind in (PRODUCT, SERVICE)
+        ]
+        return {
+            "totalBills": count,
+            "totalSales": round(float(totals.sum()), 2),
+            "averageBill": round(float(totals.mean()), 2),
+            "medianBill": round(float(np.median(totals)), 2),
+            "p90Bill": round(float(np.percentile(totals, 90)), 2),
+            "averageLines": round(float(self["bill_lines"].mean()), 2),
+            "averageUnits": round(float(self["bill_units"].mean()), 2),
+            "productOnly": int((has[PRODUCT] & ~has[SERVICE]).sum()),
+            "serviceOnly": int((has[SERVICE] & ~has[PRODUCT]).sum()),
+            "mixed": int((has[PRODUCT] & has[SERVICE]).sum()),
+        }
+
+
+class SalesFacts:
+    def __init__(self, cache_days: int = 400, today_ttl: float = 60.0, directory: Optional[str] = None,
+                 concurrency: int = 4):
+        self.today_ttl = today_ttl
+        self.directory = directory
+        self.concurrency = concurrency
+        self._days: LRUCache = LRUCache(maxsize=cache_days)
+        self._days_lock = asyncio.Lock()
+        # Today's bills by billing id, and the arrays built from them
+        self._today: Optional[date] = None
+        self._today_bills: Dict[Any, Dict[str, Any]] = {}
+        self._today_complete = True
+        self._today_loaded_at = float("-inf")
+        self._today_facts: Optional[DayFacts] = None
+        self._today_lock = asyncio.Lock()
+        # Bills appended while today is being fetched, replayed on top of it
+        self._pending: Optional[Dict[Any, Dict[str, Any]]] = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, day: date) -> Optional[str]:
+        if not self.directory:
+            return None
+        return os.path.join(self.directory, f"sales-{day.isoformat()}.v{FORMAT_VERSION}.npz")
+
+    def append(self, bills: Iterable[Dict[str, Any]]) -> None:
+        """Add written billing rows (``BILLING_COLUMNS``) to today, or evict the
+        closed day they belong to."""
+        today = datetime.utcnow().date()
+        for bill in bills:
+            when = payment_time(bill.get("payment_date"))
+            if bill.get("id") is None or when is None:
+                continue
+            day = when.date()
+            if self._pending is not None:
+                self._pending[bill["id"]] = bill
+            if day == self._today:
+                self._today_bills[bill["id"]] = bill
+                self._today_facts = None
+            elif day < today:
+                self.evict(day)
+
+    def evict(self, day: date) -> None:
+        self._days.pop(day, None)
+        path = self._path(day)
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    async def _load_today(self, repo, today: date) -> None:
+        self._pending = {}
+        try:
+            result = await fetch_billing_range(repo, today, today + timedelta(days=1), BILLING_COLUMNS,
+                                               concurrency=self.concurrency)
+        finally:
+            pending, self._pending = self._pending, None
+        bills = {row["id"]: row for row in result.rows}
+        # The fetch may have started before these bills were written
+        bills.update((bill_id, bill) for bill_id, bill in pending.items()
+                     if (payment_time(bill.get("payment_date")) or datetime.min).date() == today)
+        self._today, self._today_bills, self._today_complete = today, bills, result.complete
+        self._today_loaded_at = time.monotonic()
+        self._today_facts = None
+
+    async def today(self, repo, today: date) -> Tuple[DayFacts, bool]:
+        if self._today != today or time.monotonic() - self._today_loaded_at >= self.today_ttl:
+            async with self._today_lock:
+                if self._today != today or time.monotonic() - self._today_loaded_at >= self.today_ttl:
+                    await self._load_today(repo, today)
+        if self._today_facts is None:
+            self._today_facts = DayFacts.build(list(self._today_bills.values()))
+        return self._today_facts, self._today_complete
+
+    async def _fetch_days(self, repo, start: date, end: date, cache: bool) -> Tuple[List[DayFacts], bool]:
+        """Build [start, end) from billing, one DayFacts per day; cached if complete."""
+        result = await fetch_billing_range(repo, start, end, BILLING_COLUMNS, concurrency=self.concurrency)
+        by_day: Dict[date, List[Dict[str, Any]]] = {}
+        for row in result.rows:
+            when = payment_time(row.get("payment_date"))
+            if when is not None:
+                by_day.setdefault(when.date(), []).append(row)
+
+        def build():
+            days = []
+            day = start
+            while day < end:
+                facts = DayFacts.build(by_day.get(day, []))
+                if cache and result.complete:
+                    self._days[day] = facts
+                    path = self._path(day)
+                    if path:
+                        facts.save(path)
+                days.append(facts)
+                day += timedelta(days=1)
+            return days
+
+        return await asyncio.to_thread(build), result.complete
+
+    async def _closed(self, repo, start: date, end: date) -> Tuple[List[DayFacts], bool]:
+        async with self._days_lock:
+            # Held here too: a range longer than the cache would evict its own days
+            found: Dict[date, DayFacts] = {}
+            missing = []
+            day = start
+            while day < end:
+                path = self._path(day)
+                if day in self._days:
+                    found[day] = self._days[day]
+                elif path and os.path.exists(path):
+                    found[day] = self._days[day] = await asyncio.to_thread(DayFacts.load, path)
+                else:
+                    missing.append(day)
+                day += timedelta(days=1)
+
+            # Fetch each run of consecutive missing days with one range fetch
+            complete = True
+            run_start = 0
+            for i in range(1, len(missing) + 1):
+                if i == len(missing) or missing[i] != missing[i - 1] + timedelta(days=1):
+                    first, last = missing[run_start], missing[i - 1]
+                    days, run_complete = await self._fetch_days(repo, first, last + timedelta(days=1), cache=True)
+                    found.update(zip((first + timedelta(days=n) for n in range(len(days))), days))
+                    complete = complete and run_complete
+                    run_start = i
+
+            return [found[day] for day in sorted(found)], complete
+
+    async def facts(self, repo, start: date, end: date, today: date) -> Tuple[DayFacts, bool]:
+        """Arrays for [start, end), and whether every billing row was read."""
+        days: List[DayFacts] = []
+        complete = True
+        if start < today:
+            closed, complete = await self._closed(repo, start, min(end, today))
+            days.extend(closed)
+        if start <= today < end:
+            facts, today_complete = await self.today(repo, today)
+            days.append(facts)
+            complete = complete and today_complete
+        if end > today + timedelta(days=1):
+            # Future-dated bills: rare, so fetched every time and never cached
+            later_start = max(start, today + timedelta(days=1))
+            later, later_complete = await self._fetch_days(repo, later_start, end, cache=False)
+            days.extend(later)
+            complete = complete and later_complete
+        return await asyncio.to_thread(DayFacts.concat, days), complete
@@ -0,0 +1,6 @@
+-- Idempotency key for bills synced from the bill journal (bill_journal.py):
+-- "<journal id>-<seq>". A retried sync whose first insert reached the database
+-- inserts nothing and reads the stored row back (upsert_billings). Bills
+-- written directly by submit_bill leave it NULL, which never conflicts.
+alter table billing add column if not exists client_key text;
+create unique index if not exists billing_client_key_key on billing (client_key);
@@ -0,0 +1,90 @@
+-- One customer row per (mobile, vehicle) instead of one per bill.
+-- customer_key is the normalized "<mobile digits>|<VEHICLE>" built by the API
+-- (customer_index.customer_key); customers with neither stay keyless.
+-- Existing rows are keyed and merged by `python customer_dedup.py --apply`.
+alter table customer add column if not exists customer_key text;
+create unique index if not exists customer_customer_key_key on customer (customer_key);
+-- merge_customers re-points bills by customer_id
+create index if not exists billing_customer_id_idx on billing (customer_id);
+
+-- Insert customers, or return the existing row for the same customer_key.
+-- A non-empty name or company replaces the stored one; empty values keep it.
+-- rows: [{"name": ..., "mobile_no": ..., "vehicel_no": ..., "company": ..., "customer_key": ...}]
+-- with distinct keys (one statement cannot update the same row twice).
+create or replace function upsert_customers(rows jsonb)
+returns setof customer
+language sql
+as $$
+    insert into customer (name, mobile_no, vehicel_no, company, customer_key)
+    select r.name, r.mobile_no, r.vehicel_no, r.company, r.customer_key
+    from jsonb_to_recordset(rows) as r(name text, mobile_no text, vehicel_no text, company text, customer_key text)
+    on conflict (customer_key) do update set
+        name = coalesce(nullif(btrim(excluded.name), ''), customer.name),
+        company = coalesce(nullif(btrim(excluded.company), ''), customer.company)
+    returning *;
+$$;
+
+-- Fold duplicate customers into one row: bills are re-pointed at the kept row,
+-- the duplicates deleted and the kept row given the key and merged values.
+-- merges: [{"id": 7, "duplicates": [9, 12], "customer_key": "...", "name": ...,
+--           "company": ..., "payment": ..., "payment_date": ...}]
+-- If another row took the key in the meantime (a bill rung up while the job
+-- ran) that row is kept instead, so ids the API already handed out stay valid.
+-- Returns the number of rows deleted.
+create or replace function merge_customers(merges jsonb)
+returns integer
+language plpgsql
+as $$
+declare
+    merge jsonb;
+    keep bigint;
+    doomed bigint[];
+    removed integer := 0;
+    deleted integer;
+begin
+    for merge in select * from jsonb_array_elements(merges) loop
+        select id into keep from customer where customer_key = merge->>'customer_key';
+        keep := coalesce(keep, (merge->>'id')::bigint);
+        doomed := array(
+            select value::bigint from jsonb_array_elements_text(merge->'duplicates' || jsonb_build_array(merge->'id'))
+            where value::bigint <> keep
+        );
+        update billing set customer_id = keep where customer_id = any(doomed);
+        delete from customer where id = any(doomed);
+        get diagnostics deleted = row_count;
+        removed := removed + deleted;
+        update customer c set
+            customer_key = r.customer_key,
+            name = r.name,
+            company = r.company,
+            payment = r.payment,
+            payment_date = r.payment_date
+        from jsonb_populate_record(null::customer, merge) r
+        where c.id = keep;
+    end loop;
+    return removed;
+end;
+$$;
+
+-- customer.payment (total spent) and payment_date (last visit) follow the
+-- bills: every billing insert adds its total and moves the date forward. A
+-- trigger rather than the upsert above, so customers served from the API's
+-- cache (no upsert) and walk-ins are counted too, and a journaled bill whose
+-- insert is skipped on conflict (sql/billing_client_key.sql) is not counted twice.
+create or replace function billing_add_to_customer()
+returns trigger
+language plpgsql
+as $$
+begin
+    update customer c set
+        payment = coalesce(c.payment, 0) + coalesce(new.total, 0),
+        payment_date = greatest(c.payment_date::timestamptz, new.payment_date::timestamptz)
+    where c.id = new.customer_id;
+    return new;
+end;
+$$;
+
+drop trigger if exists billing_add_to_customer on billing;
+create trigger billing_add_to_customer
+    after insert on billing
+    for each row execute function billing_add_to_customer();
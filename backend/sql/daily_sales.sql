@@ -0,0 +1,65 @@
+-- Per-day sales rollup, one row per (day, payment_method).
+-- Maintained incrementally by submit_bill through record_daily_sale() and
+-- backfilled with rebuild_daily_sales() (see `python rollups.py rebuild`).
+create table if not exists daily_sales (
+    day date not null,
+    payment_method text not null default '',
+    bill_count integer not null default 0,
+    total numeric not null default 0,
+    product_sales numeric not null default 0,
+    service_sales numeric not null default 0,
+    primary key (day, payment_method)
+);
+
+create or replace function record_daily_sale(
+    sale_day date,
+    sale_payment_method text,
+    sale_total numeric,
+    sale_product_sales numeric,
+    sale_service_sales numeric,
+    sale_bill_count integer default 1
+)
+returns void
+language sql
+as $$
+    insert into daily_sales (day, payment_method, bill_count, total, product_sales, service_sales)
+    values (sale_day, coalesce(sale_payment_method, ''), sale_bill_count, sale_total, sale_product_sales, sale_service_sales)
+    on conflict (day, payment_method) do update set
+        bill_count = daily_sales.bill_count + excluded.bill_count,
+        total = daily_sales.total + excluded.total,
+        product_sales = daily_sales.product_sales + excluded.product_sales,
+        service_sales = daily_sales.service_sales + excluded.service_sales;
+$$;
+
+-- Recompute the rollup for [start_day, end_day) from billing. Returns rows written.
+create or replace function rebuild_daily_sales(start_day date, end_day date)
+returns integer
+language plpgsql
+as $$
+declare
+    written integer;
+begin
+    delete from daily_sales where day >= start_day and day < end_day;
+
+    insert into daily_sales (day, payment_method, bill_count, total, product_sales, service_sales)
+    select
+        b.payment_date::date,
+        coalesce(b.payment_method, ''),
+        count(*),
+        coalesce(sum(b.total), 0),
+        coalesce(sum(s.product_sales), 0),
+        coalesce(sum(s.service_sales), 0)
+    from billing b
+    cross join lateral (
+        select
+            coalesce(sum((item->>'total')::numeric) filter (where item->>'type' = 'product'), 0) as product_sales,
+            coalesce(sum((item->>'total')::numeric) filter (where item->>'type' = 'service'), 0) as service_sales
+        from jsonb_array_elements(coalesce(b.items::jsonb, '[]'::jsonb)) as item
+    ) s
+    where b.payment_date >= start_day and b.payment_date < end_day
+    group by 1, 2;
+
+    get diagnostics written = row_count;
+    return written;
+end;
+$$;
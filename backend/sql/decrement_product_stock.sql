@@ -0,0 +1,25 @@
+-- Atomically decrement stock for every product line of a bill in one statement.
+-- items: [{"id": 12, "quantity": 2}, ...]; duplicate ids are summed.
+-- Returns one row per product that exists, with the quantity before and after.
+create or replace function decrement_product_stock(items jsonb)
+returns table (id bigint, previous_quantity integer, quantity integer)
+language sql
+as $$
+    with requested as (
+        select (item->>'id')::bigint as id, sum((item->>'quantity')::integer) as amount
+        from jsonb_array_elements(items) as item
+        group by 1
+    ),
+    locked as (
+        select p.id, p.quantity
+        from products p
+        join requested r on r.id = p.id
+        for update of p
+    )
+    update products p
+    set quantity = greatest(0, p.quantity - r.amount)
+    from requested r
+    join locked l on l.id = r.id
+    where p.id = r.id
+    returning p.id, l.quantity, p.quantity;
+$$;
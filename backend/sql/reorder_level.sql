@@ -0,0 +1,5 @@
+-- Per-product low-stock threshold. A product is low on stock when its quantity
+-- is below reorder_level; NULL means the API default (LOW_STOCK_THRESHOLD).
+-- The API keeps low products in an in-memory index (inventory_index.py) that
+-- is reloaded from this table periodically.
+alter table products add column if not exists reorder_level integer check (reorder_level >= 0);
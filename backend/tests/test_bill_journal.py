@@ -0,0 +1,172 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from benchmarks.run import bill_payload
+from bill_journal import BillJournal, JournalSyncWorker, journal_path
+from conftest import client_for, run
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = BillJournal(str(tmp_path / "bill_journal.db"))
+    yield journal
+    journal.close()
+
+
+def test_journal_is_opt_in(monkeypatch):
+    monkeypatch.delenv("BILL_JOURNAL", raising=False)
+    assert journal_path() is None
+    monkeypatch.setenv("BILL_JOURNAL", "")
+    assert journal_path() is None
+    monkeypatch.setenv("BILL_JOURNAL", "/var/lib/pos-system/bill_journal.db")
+    assert journal_path() == "/var/lib/pos-system/bill_journal.db"
+
+
+def test_claims_are_exclusive_and_expire(tmp_path):
+    path = str(tmp_path / "shared.db")
+    first, second = BillJournal(path), BillJournal(path, claim_ttl=0.2)
+
+    async def scenario():
+        for i in range(5):
+            await first.append({"n": i})
+        claimed = await first.claim(3)
+        assert [entry.seq for entry in claimed] == [1, 2, 3]
+        assert len({entry.client_key for entry in claimed}) == 3
+        # The other process waits while the claim is live, even for later bills
+        assert await second.claim(10) == []
+        assert (await second.status())["claimed_elsewhere"] == 3
+        # and takes the bills over once it has expired
+        await asyncio.sleep(0.25)
+        assert [entry.seq for entry in await second.claim(10)] == [1, 2, 3, 4, 5]
+        await second.release()
+        assert [entry.seq for entry in await first.claim(2)] == [1, 2]
+
+    try:
+        run(scenario())
+    finally:
+        first.close()
+        second.close()
+
+
+def test_client_keys_survive_reopening(tmp_path):
+    path = str(tmp_path / "bill_journal.db")
+    journal = BillJournal(path)
+    key = journal.client_key(7)
+    journal.close()
+    reopened = BillJournal(path)
+    assert reopened.client_key(7) == key
+    reopened.close()
+
+
+def test_journal_without_claim_columns_is_migrated(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""create table journal (seq integer primary key autoincrement, payload text not null,
+                    progress text not null default '{}', status text not null default 'pending',
+                    attempts integer not null default 0, last_error text, result text,
+                    created_at real not null, synced_at real)""")
+    conn.execute("insert into journal (payload, created_at) values ('{\"n\": 1}', ?)", (time.time(),))
+    conn.commit()
+    conn.close()
+
+    journal = BillJournal(path)
+    entries = run(journal.claim(10))
+    assert [(entry.seq, entry.payload) for entry in entries] == [(1, {"n": 1})]
+    journal.close()
+
+
+def test_worker_syncs_in_order_and_parks_a_bad_bill(journal):
+    synced = []
+
+    async def apply(entries):
+        if any(entry.payload.get("bad") for entry in entries):
+            raise RuntimeError("rejected")
+        synced.extend(entry.payload["n"] for entry in entries)
+        return [{"ok": True} for _ in entries]
+
+    async def scenario():
+        for i in range(4):
+            await journal.append({"n": i, "bad": i == 2})
+        worker = JournalSyncWorker(journal, apply, batch_size=10, max_attempts=2, backoff=0.01)
+        worker.start()
+        await asyncio.wait_for(worker.drain(), 5)
+        await worker.stop()
+        return await journal.status()
+
+    status = run(scenario())
+    # Bill 3 waited for bill 2, which was isolated and parked after two attempts
+    assert synced == [0, 1, 3]
+    assert (status["pending"], status["failed"], status["synced"]) == (0, 1, 3)
+    assert status["last_failed"] == {"seq": 3, "error": "rejected"}
+
+
+def test_bill_appended_after_the_idle_check_is_synced(journal):
+    synced = []
+
+    async def apply(entries):
+        synced.extend(entry.seq for entry in entries)
+        return [{} for _ in entries]
+
+    async def scenario():
+        worker = JournalSyncWorker(journal, apply, backoff=0.01)
+        status = journal.status
+        arrived = []
+
+        async def status_then_new_bill():
+            # A bill is submitted right after the worker found nothing pending
+            result = await status()
+            if not arrived:
+                arrived.append(await journal.append({"late": True}))
+                worker.wake()
+            return result
+
+        journal.status = status_then_new_bill
+        await journal.append({"first": True})
+        worker.start()
+        await asyncio.sleep(0.3)
+        await worker.stop(drain_timeout=0)
+
+    run(scenario())
+    assert synced == [1, 2]
+
+
+def test_upsert_billings_is_idempotent(repo):
+    async def scenario():
+        rows = [{"client_key": f"journal-{i}", "payment_date": "2026-10-05T09:00:00", "total": 10, "items": []}
+                for i in range(3)]
+        first = await repo.upsert_billings(rows[:2])
+        # The response to the first insert was lost; the retry includes a new bill
+        second = await repo.upsert_billings(rows)
+        assert [row["id"] for row in second[:2]] == [row["id"] for row in first]
+        assert [row["client_key"] for row in second] == ["journal-0", "journal-1", "journal-2"]
+        assert await repo.count_billing("2026-10-05", "2026-10-06") == 3
+
+    run(scenario())
+
+
+def test_submit_bill_is_journaled_and_synced(app_main, repo, tmp_path, monkeypatch):
+    journal = BillJournal(str(tmp_path / "bill_journal.db"))
+    worker = JournalSyncWorker(journal, app_main.sync_journaled_bills, backoff=0.01)
+    monkeypatch.setattr(app_main, "bill_journal", journal)
+    monkeypatch.setattr(app_main, "journal_worker", worker)
+
+    async def scenario():
+        worker.start()
+        try:
+            async with client_for(app_main.app) as client:
+                responses = [await client.post("/api/submit_bill", json=bill_payload(3)) for _ in range(3)]
+            assert [response.status_code for response in responses] == [202] * 3
+            assert [response.json()["journal_seq"] for response in responses] == [1, 2, 3]
+            await asyncio.wait_for(worker.drain(), 5)
+        finally:
+            await worker.stop()
+        bills, _ = await repo.billing_page("2000-01-01", "2100-01-01")
+        assert sorted(bill["client_key"] for bill in bills) == [journal.client_key(seq) for seq in (1, 2, 3)]
+
+    try:
+        run(scenario())
+    finally:
+        journal.close()
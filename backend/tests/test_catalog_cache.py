@@ -0,0 +1,108 @@
+import asyncio
+
+from catalog_cache import CatalogCache, CatalogEntry
+from conftest import client_for, run
+
+ROWS = [{"id": i, "code": f"P{i:05d}", "price": float(i), "quantity": 10} for i in range(1, 6)]
+
+
+def test_etag_is_content_digest():
+    first = CatalogEntry([dict(row) for row in ROWS], version=1)
+    second = CatalogEntry([dict(row) for row in reversed(ROWS)], version=7)
+    assert first.etag == second.etag
+    changed = CatalogEntry([{**row, "price": 99.0} if row["id"] == 3 else row for row in ROWS], version=1)
+    assert changed.etag != first.etag
+
+
+def test_etag_stays_current_through_writes():
+    entry = CatalogEntry([dict(row) for row in ROWS], version=1)
+    before = entry.etag
+    entry.set_rows([{**ROWS[1], "price": 50.0}, {"id": 9, "code": "P00009", "price": 9.0, "quantity": 1}])
+    assert entry.etag != before
+    # The incrementally updated digest equals one computed from scratch
+    assert entry.etag == CatalogEntry(entry.values(), version=2).etag
+
+
+def test_concurrent_misses_load_once():
+    cache = CatalogCache()
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        await asyncio.sleep(0.01)
+        return [dict(row) for row in ROWS]
+
+    async def scenario():
+        entries = await asyncio.gather(*(cache.get("products", loader) for _ in range(5)))
+        assert len({id(entry) for entry in entries}) == 1
+
+    run(scenario())
+    assert len(loads) == 1
+
+
+def test_write_during_load_is_not_cached():
+    cache = CatalogCache()
+
+    async def loader():
+        # A write lands while the (now stale) rows are in flight
+        cache.upsert("products", [{"id": 1, "price": 5.0}])
+        return [dict(row) for row in ROWS]
+
+    async def scenario():
+        await cache.get("products", loader)
+        assert cache.peek("products") is None
+
+    run(scenario())
+
+
+def test_oversized_table_is_not_cached():
+    cache = CatalogCache(max_rows=3)
+
+    async def scenario():
+        entry = await cache.get("products", lambda: asyncio.sleep(0, [dict(row) for row in ROWS]))
+        assert len(entry.rows) == 5
+        assert cache.peek("products") is None
+        assert cache.oversized("products")
+        assert not cache.oversized("services")
+
+    run(scenario())
+
+
+def test_upsert_and_stock_update_cached_rows():
+    cache = CatalogCache()
+
+    async def scenario():
+        entry = await cache.get("products", lambda: asyncio.sleep(0, [dict(row) for row in ROWS]))
+        version = entry.version
+        cache.upsert("products", [{"id": 2, "price": 42.0}])
+        cache.apply_stock([{"id": 3, "quantity": 4}, {"id": 99, "quantity": 1}])
+        cached = cache.peek("products")
+        assert cached.rows[2] == {**ROWS[1], "price": 42.0}
+        assert cached.rows[3]["quantity"] == 4
+        assert 99 not in cached.rows
+        assert cached.version > version
+
+    run(scenario())
+
+
+def test_catalog_etag_and_write_through(app_main):
+    async def scenario():
+        async with client_for(app_main.app) as client:
+            first = await client.get("/api/get_all_data")
+            etag = first.headers["etag"]
+            cached = await client.get("/api/get_all_data", headers={"If-None-Match": etag})
+            assert cached.status_code == 304
+
+            await client.post("/api/edit_products", json={"code": "P00002", "price": 123.0})
+            changed = await client.get("/api/get_all_data", headers={"If-None-Match": etag})
+            assert changed.status_code == 200
+            assert changed.headers["etag"] != etag
+            product = next(row for row in changed.json()["products"] if row["code"] == "P00002")
+            assert product["price"] == 123.0
+
+            # A fresh cache loading the same rows hands out the same tag
+            app_main.catalog_cache = CatalogCache()
+            reloaded = await client.get("/api/get_all_data")
+            assert reloaded.headers["etag"] == changed.headers["etag"]
+
+    run(scenario())
@@ -0,0 +1,134 @@
+import asyncio
+
+from pydantic import BaseModel
+
+import catalog_import
+from conftest import client_for, run
+
+
+async def chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+def test_lines_split_across_chunks_and_bom():
+    text = "﻿code,name\r\nA,é\nB,x".encode()
+    # Split inside the multi-byte character and inside the line ending
+    parts = (text[:13], text[13:15], text[15:])
+    lines = run(collect(catalog_import.iter_lines(chunks(*parts))))
+    assert lines == ["code,name\r\n", "A,é\n", "B,x"]
+
+
+def test_csv_records_with_quoted_newlines_and_errors():
+    lines = ['code,name\n', 'A,"two\n', 'lines"\n', '\n', 'B,plain\n', 'C,"unterminated\n']
+    records = run(collect(catalog_import.iter_csv_records(collect_lines(lines))))
+    assert records == [
+        (2, {"code": "A", "name": "two\nlines"}),
+        (5, {"code": "B", "name": "plain"}),
+        (6, "Malformed CSV: unterminated quoted field"),
+    ]
+
+
+def test_ndjson_records_report_bad_lines():
+    lines = ['{"code": "A"}\n', 'not json\n', '[1]\n', '\n', '{"code": "B"}\n']
+    records = run(collect(catalog_import.iter_ndjson_records(collect_lines(lines))))
+    assert records[0] == (1, {"code": "A"})
+    assert records[1][0] == 2 and records[1][1].startswith("Invalid JSON")
+    assert records[2] == (3, "Expected a JSON object")
+    assert records[3] == (5, {"code": "B"})
+
+
+async def collect_lines(lines):
+    for line in lines:
+        yield line
+
+
+class Item(BaseModel):
+    code: str
+    price: float
+
+
+def test_import_chunks_dedups_and_reports():
+    written = []
+
+    async def upsert(rows):
+        await asyncio.sleep(0)
+        if any(row["code"] == "FAIL" for row in rows):
+            raise RuntimeError("backend down")
+        written.append([row["code"] for row in rows])
+        return rows
+
+    records = collect_lines([
+        (1, {"code": "A", "price": 1}),
+        (2, {"code": "B", "price": "x"}),
+        (3, {"code": "A", "price": 2}),
+        (4, {"code": "C", "price": 3}),
+        (5, "Malformed CSV: oops"),
+        (6, {"code": "FAIL", "price": 4}),
+    ])
+    report = run(catalog_import.import_catalog(
+        records, Item, lambda item: item.model_dump(), upsert, lambda rows: None, chunk_size=2
+    ))
+    # A's later row replaced the earlier one in the same chunk
+    assert written == [["A", "C"]]
+    assert (report["received"], report["upserted"], report["failed"]) == (6, 3, 3)
+    assert [(error["line"], error["code"]) for error in report["errors"]] == [(2, "B"), (5, None), (6, "FAIL")]
+    assert report["errors"][2]["errors"] == ["Write failed: backend down"]
+
+
+def test_import_keeps_live_stock(app_main, repo):
+    csv = "code,name,price,quantity\nP00001,Renamed,9.5,5\nNEW1,New,3,7\n"
+
+    async def scenario():
+        async with client_for(app_main.app) as client:
+            response = await client.post("/api/products/import?format=csv", content=csv)
+            assert response.json()["upserted"] == 2
+            products = {row["code"]: row for row in await repo.list_products()}
+            existing, new = products["P00001"], products["NEW1"]
+            assert (existing["name"], existing["price"], existing["quantity"]) == ("Renamed", 9.5, 1_000_000)
+            assert existing.get("created_at") is None
+            assert (new["quantity"], new["edited_by"]) == (7, "no")
+            assert new["created_at"]
+
+            # The cache serves what was written
+            catalog = (await client.get("/api/get_all_data")).json()
+            cached = next(row for row in catalog["products"] if row["code"] == "P00001")
+            assert (cached["name"], cached["quantity"]) == ("Renamed", 1_000_000)
+
+            await client.post("/api/products/import?format=csv&set_stock=true", content=csv)
+            products = {row["code"]: row for row in await repo.list_products()}
+            assert products["P00001"]["quantity"] == 5
+
+    run(scenario())
+
+
+def test_service_import_sets_created_at_on_insert_only(app_main, repo):
+    body = '{"code": "S0001", "name": "Wash", "price": 1}\n{"code": "S9", "name": "Wax", "price": 2}\n'
+
+    async def scenario():
+        async with client_for(app_main.app) as client:
+            response = await client.post("/api/services/import", content=body,
+                                         headers={"Content-Type": "application/x-ndjson"})
+            assert response.json()["upserted"] == 2
+        services = {row["code"]: row for row in await repo.list_services()}
+        assert services["S0001"]["name"] == "Wash"
+        assert services["S0001"].get("created_at") is None
+        assert services["S9"]["created_at"]
+
+    run(scenario())
+
+
+def test_export_round_trips_through_import(app_main, repo):
+    async def scenario():
+        async with client_for(app_main.app) as client:
+            exported = await client.get("/api/products/export?format=csv")
+            assert exported.text.splitlines()[0] == ",".join(app_main.CATALOG_EXPORT_COLUMNS["products"])
+            report = (await client.post("/api/products/import?format=csv", content=exported.content)).json()
+        assert (report["upserted"], report["failed"]) == (20, 0)
+        assert await repo.count_products() == 20
+
+    run(scenario())
@@ -0,0 +1,132 @@
+import pytest
+
+import customer_dedup
+from benchmarks.run import bill_payload
+from conftest import client_for, run
+from customer_index import CustomerIndex, customer_key
+
+
+def customer(customer_id, name, mobile, vehicle, **extra):
+    return {"id": customer_id, "name": name, "mobile_no": mobile, "vehicel_no": vehicle, "company": "", **extra}
+
+
+async def pages(rows):
+    yield rows
+
+
+def loader(rows):
+    def iterate(after=None):
+        return pages([row for row in rows if after is None or row["id"] > after])
+    return iterate
+
+
+def test_customer_key_normalizes():
+    assert customer_key("077 123-4567", "cab 1234") == "0771234567|CAB1234"
+    assert customer_key("", "CAB-1234") == "|CAB1234"
+    assert customer_key(" ", None) is None
+
+
+def test_plan_merges_folds_duplicates():
+    rows = [
+        customer(1, "Old", "0771234567", "CAB-1234", payment=100, payment_date="2026-01-01T10:00:00"),
+        customer(2, "", "077 123 4567", "cab1234", payment=50, payment_date="2026-03-01T10:00:00"),
+        customer(3, "New", "0771234567", "CAB 1234", customer_key="0771234567|CAB1234", payment=None),
+        customer(4, "Walk-in", "", ""),
+        customer(5, "Single", "0711111111", "WP-1", customer_key="0711111111|WP1"),
+    ]
+    merges = customer_dedup.plan_merges(rows)
+    # The row the API already keyed is kept; blank and already-keyed single rows are left alone
+    assert merges == [{
+        "id": 3, "duplicates": [1, 2], "customer_key": "0771234567|CAB1234", "name": "New", "company": "",
+        "payment": 150, "payment_date": "2026-03-01T10:00:00",
+    }]
+
+
+def test_dedup_merges_rows_and_repoints_bills(repo, load_rows):
+    load_rows("customer", [
+        customer(1, "A", "0771234567", "CAB-1234", payment=10, payment_date="2026-01-01T10:00:00"),
+        customer(2, "A", "0771234567", "CAB-1234", payment=20, payment_date="2026-01-02T10:00:00"),
+        customer(3, "B", "0712222222", "WP-9", payment=5, payment_date="2026-01-03T10:00:00"),
+    ])
+    load_rows("billing", [
+        {"id": i, "customer_id": i, "total": 10, "items": [], "payment_date": f"2026-01-0{i}T10:00:00"}
+        for i in (1, 2, 3)
+    ])
+
+    async def scenario():
+        assert (await customer_dedup.dedup(repo))["removed"] == 0
+        stats = await customer_dedup.dedup(repo, apply=True)
+        assert (stats["merges"], stats["duplicates"], stats["removed"]) == (2, 1, 1)
+        customers = {row["id"]: row for row in await repo.list_customers()}
+        assert set(customers) == {1, 3}
+        assert customers[1]["payment"] == 30
+        assert customers[1]["payment_date"].startswith("2026-01-02")
+        bills, _ = await repo.billing_page("2026-01-01", "2026-02-01")
+        assert {bill["id"]: bill["customer_id"] for bill in bills} == {1: 1, 2: 1, 3: 3}
+        # Nothing left to do on a second run
+        assert (await customer_dedup.dedup(repo, apply=True))["merges"] == 0
+
+    run(scenario())
+
+
+def test_returning_customer_reuses_row_and_keeps_totals(app_main, repo):
+    async def scenario():
+        async with client_for(app_main.app) as client:
+            for day in (1, 5, 3):
+                payload = bill_payload(2)
+                payload["date"] = f"2026-10-0{day}T09:00:00"
+                response = await client.post("/api/submit_bill", json=payload)
+                assert response.status_code == 200
+        customers = await repo.list_customers_page(10, named=False)
+        assert len(customers) == 1
+        # The later bills hit the customer cache and still add to the totals
+        assert customers[0]["payment"] == pytest.approx(3 * bill_payload(2)["total"])
+        assert customers[0]["payment_date"].startswith("2026-10-05T09:00:00")
+
+    run(scenario())
+
+
+def test_index_replaces_changed_rows():
+    index = CustomerIndex()
+    index.add([customer(1, "Nimal Perera", "0771234567", "CAB-1234")])
+    assert [row["id"] for row in index.search("nimal")] == [1]
+    assert [row["id"] for row in index.search("4567", "mobile")] == [1]
+
+    index.add([customer(1, "Kamal Silva", "0779999999", "CAB-1234")])
+    assert index.search("nimal") == []
+    assert index.search("4567", "mobile") == []
+    assert [row["name"] for row in index.search("silva")] == ["Kamal Silva"]
+    assert [row["id"] for row in index.search("1234", "vehicle")] == [1]
+
+
+def test_index_collapses_repeat_visits_to_the_latest_row():
+    index = CustomerIndex()
+    index.add([customer(1, "Old", "0771234567", "CAB-1234"), customer(7, "New", "077 123 4567", "cab1234")])
+    assert [row["id"] for row in index.search("077")] == [7]
+
+
+def test_reload_drops_merged_rows_and_keeps_rows_added_meanwhile():
+    rows = [customer(1, "Dup", "0771234567", "CAB-1234"), customer(2, "Dup", "0771234567", "CAB-1234"),
+            customer(3, "Other", "0712222222", "WP-9")]
+    index = CustomerIndex(refresh_interval=0)
+
+    async def snapshot(after=None):
+        # The reload reads its snapshot; submit_bill indexes a new customer before it is swapped in
+        snapshot_rows = [row for row in rows if after is None or row["id"] > after]
+        if after is None and index.loaded_at:
+            index.add([customer(4, "Fresh", "0703333333", "KA-1")])
+        yield snapshot_rows
+
+    async def scenario():
+        await index.ensure_fresh(snapshot)
+        assert len(index) == 3
+        # customer_dedup deletes row 2 elsewhere; the next full reload drops it
+        del rows[1]
+        index.reload_interval = 0
+        await index.ensure_fresh(snapshot)
+        await index._reload_task
+        return sorted(index.customers)
+
+    assert run(scenario()) == [1, 3, 4]
+    assert [row["id"] for row in index.search("fresh")] == [4]
+    assert [row["id"] for row in index.search("dup")] == [1]
@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+
+from conftest import client_for, run
+
+
+def test_summary_counts(app_main, repo):
+    async def scenario():
+        today = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+        async with client_for(app_main.app) as client:
+            # One low-stock product, two bills today and one yesterday
+            await client.post("/api/edit_products", json={"code": "P00003", "quantity": 2})
+            for when in (today, today + timedelta(minutes=5), today - timedelta(days=1)):
+                await repo.insert_billings([{"payment_date": when.isoformat(), "total": 10, "items": []}])
+            response = await client.get("/api/get_summary_data")
+        assert response.status_code == 200
+        assert response.json() == {
+            "total_products": 20,
+            "total_services": 5,
+            "total_bills": 2,
+            "low_stock_count": 1,
+        }
+
+    run(scenario())
+
+
+def test_all_data_returns_both_catalogs(app_main):
+    async def scenario():
+        async with client_for(app_main.app) as client:
+            response = await client.get("/api/get_all_data")
+        assert response.status_code == 200
+        body = response.json()
+        assert len(body["products"]) == 20
+        assert len(body["services"]) == 5
+        assert {"P00001", "P00020"} <= {product["code"] for product in body["products"]}
+
+    run(scenario())
@@ -0,0 +1,143 @@
+import asyncio
+import zlib
+from datetime import datetime
+from decimal import Decimal
+
+import brotli
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from conftest import client_for, run
+from fast_response import CompressionMiddleware, FastJSONResponse, dumps
+
+BIG = "x" * 5000
+
+
+async def big(request):
+    return PlainTextResponse(BIG)
+
+
+async def small(request):
+    return PlainTextResponse("ok")
+
+
+async def encoded(request):
+    return Response(zlib.compress(BIG.encode()), headers={"Content-Encoding": "deflate"})
+
+
+async def chunks():
+    for i in range(3):
+        yield f"chunk {i} " * 200
+
+
+async def stream(request):
+    return StreamingResponse(chunks(), media_type="text/plain")
+
+
+async def events(request):
+    return StreamingResponse(chunks(), media_type="text/event-stream")
+
+
+app = CompressionMiddleware(Starlette(routes=[
+    Route("/big", big), Route("/small", small), Route("/encoded", encoded),
+    Route("/stream", stream), Route("/events", events),
+]), minimum_size=1024)
+
+
+async def raw_request(path, accept_encoding):
+    """Send one request through ``app`` and return the ASGI messages it sent."""
+    sent = []
+    scope = {"type": "http", "method": "GET", "path": path, "raw_path": path.encode(), "query_string": b"",
+             "headers": [(b"accept-encoding", accept_encoding.encode())], "http_version": "1.1",
+             "scheme": "http", "server": ("test", 80), "client": ("test", 1), "root_path": ""}
+
+    requested = []
+
+    async def receive():
+        if not requested:
+            requested.append(True)
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Streaming responses wait for a disconnect that never comes
+        await asyncio.Event().wait()
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return sent
+
+
+def headers_of(messages):
+    return {key.decode(): value.decode() for key, value in messages[0]["headers"]}
+
+
+def bodies_of(messages):
+    return [message.get("body", b"") for message in messages[1:] if message["type"] == "http.response.body"]
+
+
+def test_imports_under_pinned_requirements():
+    # Fails with an ImportError when the middleware relies on starlette
+    # internals the pinned version lacks (requirements.txt pins starlette)
+    import main
+
+    assert any(middleware.cls is CompressionMiddleware for middleware in main.app.user_middleware)
+
+
+def test_dumps_handles_datetimes_and_decimals():
+    assert dumps({"at": datetime(2026, 10, 5, 9, 0), "total": Decimal("1.50"), 1: None}) == \
+        b'{"at":"2026-10-05T09:00:00","total":"1.50","1":null}'
+    assert FastJSONResponse({"a": [1, 2]}).body == b'{"a":[1,2]}'
+
+
+def test_large_responses_are_compressed():
+    messages = run(raw_request("/big", "gzip, deflate, br"))
+    headers = headers_of(messages)
+    assert headers["content-encoding"] == "br"
+    assert "accept-encoding" in headers["vary"].lower()
+    body = b"".join(bodies_of(messages))
+    assert int(headers["content-length"]) == len(body)
+    assert brotli.decompress(body).decode() == BIG
+
+    messages = run(raw_request("/big", "gzip, br;q=0"))
+    assert headers_of(messages)["content-encoding"] == "gzip"
+    assert zlib.decompress(b"".join(bodies_of(messages)), 31).decode() == BIG
+
+
+def test_small_encoded_and_unaccepted_responses_pass_through():
+    for path, accept_encoding in (("/small", "gzip"), ("/encoded", "gzip, br"), ("/big", "identity")):
+        messages = run(raw_request(path, accept_encoding))
+        headers = headers_of(messages)
+        assert headers.get("content-encoding") in (None, "deflate"), path
+        assert int(headers["content-length"]) == len(b"".join(bodies_of(messages)))
+
+
+def test_streams_are_compressed_chunk_by_chunk():
+    for accept_encoding, decompressor in (("gzip", lambda: zlib.decompressobj(31)),
+                                          ("br", brotli.Decompressor)):
+        messages = run(raw_request("/stream", accept_encoding))
+        headers = headers_of(messages)
+        assert headers["content-encoding"] == accept_encoding
+        assert "content-length" not in headers
+        decoder = decompressor()
+        decoded = []
+        for body in bodies_of(messages):
+            # Each chunk decodes on arrival: nothing is held back in the compressor
+            decoded.append(decoder.decompress(body) if accept_encoding == "gzip" else decoder.process(body))
+        assert [part.decode() for part in decoded[:3]] == [f"chunk {i} " * 200 for i in range(3)]
+
+
+def test_server_sent_events_are_not_compressed():
+    messages = run(raw_request("/events", "gzip, br"))
+    assert "content-encoding" not in headers_of(messages)
+    assert b"".join(bodies_of(messages)).decode() == "".join(f"chunk {i} " * 200 for i in range(3))
+
+
+def test_app_compresses_large_json(app_main):
+    async def scenario():
+        async with client_for(app_main.app) as client:
+            response = await client.get("/api/get_all_data", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert len(response.json()["products"]) == 20
+
+    run(scenario())
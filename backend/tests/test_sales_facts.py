@@ -0,0 +1,125 @@
+import json
+from datetime import date, datetime
+
+import pytest
+
+from conftest import client_for, run
+from sales_facts import PRODUCT, SERVICE, DayFacts, SalesFacts, payment_time
+
+BILLS = [
+    {"id": 1, "payment_date": "2026-10-05T09:15:00", "total": 60, "items": [
+        {"id": 1, "type": "product", "code": "P1", "name": "Oil", "quantity": 2, "total": 20},
+        {"id": 7, "type": "service", "code": "S7", "name": "Wash", "quantity": 1, "total": 40},
+    ]},
+    # items stored as JSON text, and a line of an unknown type
+    {"id": 2, "payment_date": "2026-10-05T09:45:00+00:00", "total": 35, "items": json.dumps([
+        {"id": 1, "type": "product", "code": "P1", "name": "Oil", "quantity": 3, "total": 30},
+        {"id": "x", "type": "custom", "total": 5},
+    ])},
+    {"id": 3, "payment_date": "2026-10-05T18:00:00", "total": 40, "items": [
+        {"id": 7, "type": "service", "code": "S7", "name": "Wash", "quantity": 1, "total": 40},
+    ]},
+]
+
+
+def test_payment_time_is_naive_utc():
+    assert payment_time("2026-10-05T01:00:00+05:30") == datetime(2026, 10, 4, 19, 30)
+    assert payment_time("2026-10-05T01:00:00") == datetime(2026, 10, 5, 1, 0)
+    assert payment_time("not a date") is None
+    assert payment_time(None) is None
+
+
+def test_day_facts_analytics():
+    facts = DayFacts.build(BILLS)
+    assert facts.bills == 3
+    assert facts.top(PRODUCT) == [{"id": 1, "code": "P1", "name": "Oil", "sales": 50.0, "quantity": 5.0, "bills": 2}]
+    assert facts.top(SERVICE, by="quantity")[0]["bills"] == 2
+    hours = {hour["hour"]: hour for hour in facts.hourly() if hour["totalBills"]}
+    assert hours[9] == {"hour": 9, "totalBills": 2, "totalSales": 95.0, "productSales": 50.0, "serviceSales": 40.0}
+    assert hours[18]["serviceSales"] == 40.0
+    basket = facts.basket()
+    assert (basket["totalBills"], basket["totalSales"], basket["medianBill"]) == (3, 135.0, 40.0)
+    assert (basket["productOnly"], basket["serviceOnly"], basket["mixed"]) == (1, 1, 1)
+
+
+def test_concat_keeps_bills_apart_and_round_trips(tmp_path):
+    days = [DayFacts.build(BILLS[:1]), DayFacts.build([]), DayFacts.build(BILLS[1:])]
+    merged = DayFacts.concat(days)
+    assert merged.basket() == DayFacts.build(BILLS).basket()
+    path = str(tmp_path / "day.npz")
+    merged.save(path)
+    assert DayFacts.load(path).top(PRODUCT) == merged.top(PRODUCT)
+
+
+class CountingRepo:
+    """Counts billing page reads of the wrapped repository."""
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.pages = 0
+
+    async def billing_page(self, *args, **kwargs):
+        self.pages += 1
+        return await self.repo.billing_page(*args, **kwargs)
+
+
+def test_closed_days_are_cached_and_evicted(sql_repo, tmp_path):
+    sql_repo.load("billing", BILLS)
+    repo = CountingRepo(sql_repo)
+    store = SalesFacts(directory=str(tmp_path))
+    today = date(2026, 10, 10)
+
+    async def scenario():
+        facts, complete = await store.facts(repo, date(2026, 10, 4), date(2026, 10, 7), today)
+        assert complete and facts.bills == 3
+        reads = repo.pages
+        await store.facts(repo, date(2026, 10, 5), date(2026, 10, 6), today)
+        assert repo.pages == reads
+        # A restart reads the day files instead of billing
+        restarted = SalesFacts(directory=str(tmp_path))
+        assert (await restarted.facts(repo, date(2026, 10, 5), date(2026, 10, 6), today))[0].bills == 3
+        assert repo.pages == reads
+
+        # A late bill for a closed day evicts it, so it is rebuilt
+        late = {"id": 4, "payment_date": "2026-10-05T23:00:00", "total": 5, "items": []}
+        sql_repo.load("billing", [late])
+        store.append([late])
+        facts, _ = await store.facts(repo, date(2026, 10, 5), date(2026, 10, 6), today)
+        assert facts.bills == 4 and repo.pages > reads
+
+    run(scenario())
+
+
+def test_today_includes_appended_bills(sql_repo):
+    today = datetime.utcnow().date()
+    store = SalesFacts(today_ttl=3600)
+
+    async def scenario():
+        assert (await store.today(sql_repo, today))[0].bills == 0
+        store.append([{"id": 9, "payment_date": f"{today.isoformat()}T08:00:00", "total": 12, "items": []}])
+        facts, _ = await store.today(sql_repo, today)
+        return facts.basket()["totalSales"]
+
+    assert run(scenario()) == 12
+
+
+@pytest.mark.parametrize("path", ["top", "hourly", "basket"])
+def test_analytics_endpoints(app_main, load_rows, path):
+    load_rows("billing", BILLS)
+    params = {"start_date": "2026-10-05", "end_date": "2026-10-05", **({"kind": "service"} if path == "top" else {})}
+
+    async def scenario():
+        async with client_for(app_main.app) as client:
+            response = await client.get(f"/api/analytics/{path}", params=params)
+        assert response.status_code == 200
+        body = response.json()
+        assert body["complete"] is True
+        return body
+
+    body = run(scenario())
+    if path == "basket":
+        assert body["totalBills"] == 3
+    elif path == "hourly":
+        assert sum(hour["totalBills"] for hour in body["hours"]) == 3
+    else:
+        assert body["items"][0]["code"] == "S7"
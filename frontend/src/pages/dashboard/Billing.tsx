@@ -128,6 +128,7 @@ const Billing = () => {
       
       setBillItems(updatedItems);
     } else {
+      const discount = 'discount' in item && item.discount ? item.discount : 0;
       const newBillItem: BillItem = {
         id: item.id,
         type: itemType,
@@ -135,8 +136,8 @@ const Billing = () => {
         code: item.code,
         price: item.price,
         quantity: 1,
-        discount: 'discount' in item && item.discount ? item.discount : 0,
-        total: item.price
+        discount,
+        total: 1 * (item.price * (1 - discount / 100))
       };
       
       setBillItems([...billItems, newBillItem]);